@@ -1,11 +1,13 @@
 import pygame
-import threading
 import copy
 import sys
+import random
 import pyperclip
-import os
-import json
-from sudoku import Sudoku, conflicts
+import multiprocessing
+from sudoku import Sudoku, GenerationJob, check_pool
+from puzzlepool import PuzzlePool
+from puzzlestore import PuzzleStore
+from savegame import Savegame
 from button import Button
 from textbox import Textbox
 from progressbar import ProgressBar
@@ -59,8 +61,9 @@ def graphical_print(sudoku, notes, colors, current_light_color = None, selected
     if shadow is not None:
         shadow.draw(screen)
     # draw cells
+    board = sudoku.board
     for i in range(81):
-        value = sudoku.board[i]
+        value = board[i]
         if colors[i] is not None:
             cell_color = color_table[colors[i]]
         else:
@@ -76,7 +79,7 @@ def graphical_print(sudoku, notes, colors, current_light_color = None, selected
         rect = pygame.rect.Rect(cell_left, cell_top, cell_w, cell_h)
         pygame.draw.rect(screen, cell_bg, rect)
         # conflicting cells marked
-        if value != 0 and conflicts(sudoku.board, i, value):
+        if value != 0 and sudoku.conflicts(i):
             draw_stripes(gray, 6, 3, cell_left, cell_top, cell_w, cell_h, True)
         # draw notes
         cell_notes = notes[i]
@@ -140,35 +143,27 @@ def create_default_shadow(pos, size, border_radius = [-1, -1, -1, -1], extra_off
     extra_size = extra_extra_size
     return Shadow(pos, size, strength, radius, border_radius, offset, extra_size)
 
-def write_savegame(board, fixed, notes, colors, history, path = "./data"):
-    file = open(f"{path}/savegame.json", "w")
-    data = {
-        "board": board,
-        "fixed": fixed,
-        "notes": notes,
-        "colors": colors,
-        "history": history
-    }
-    json.dump(data, file, indent= 4)
-    file.close()
-
-def read_savegame(path = "./data"):
-    # load stored game if exists
-    if not os.path.exists(f"{path}/"):
-        os.mkdir(path)
-    if os.path.exists(f"{path}/savegame.json"):
-        file = open(f"{path}/savegame.json", "r")
-        data = json.load(file)
-        sudoku = Sudoku()
-        sudoku.board = data["board"]
-        sudoku.fixed = data["fixed"]
-        notes = data["notes"]
-        colors = data["colors"]
-        history = data["history"]
-        print("Loaded game from file")
-        file.close()
-    else:
+savegame = Savegame()
+
+def write_savegame(board, fixed, notes, colors, history):
+    # full snapshot, replaces the file atomically and clears the journal
+    savegame.write(board, fixed, notes, colors, history)
+
+def journal_move(sudoku, notes, colors, history, index, operation):
+    # append a single move to the savegame, operation is what it did to history
+    if operation is not None:
+        savegame.record(sudoku.board, sudoku.fixed, notes, colors, history, index, operation)
+
+def read_savegame():
+    # load stored game with its journal replayed if exists
+    data = savegame.read()
+    if data is None:
         return None, None, None, None
+    board, fixed, notes, colors, history = data
+    sudoku = Sudoku()
+    sudoku.board = board
+    sudoku.fixed = fixed
+    print("Loaded game from file")
     return sudoku, notes, colors, history
 
 # game functions ---------------------------
@@ -200,21 +195,23 @@ def notes_toggle(note_mode, buttons):
 def undo(history, sudoku, notes, colors):
     popped = history.pop()
     index = popped[0]
-    sudoku.board[index] = popped[1]
+    sudoku.set_cell(index, popped[1])
     notes[index] = popped[2]
     colors[index] = popped[3]
+    journal_move(sudoku, notes, colors, history, index, "pop")
     return notes, colors
 
 def copy_board_info(sudoku, notes, colors):
-    board_copy = sudoku.board[:]
+    board_copy = sudoku.board
     fixed_copy = sudoku.fixed[:]
     notes_copy = copy.deepcopy(notes)
     colors_copy = colors[:]
     return board_copy, fixed_copy, notes_copy, colors_copy
 
 def add_to_history(history, new_board_info, old_board_info):
+    # returns "push" or "pop" for the change made to history, None if nothing changed
     if new_board_info == old_board_info:
-        return
+        return None
     else:
         # get index of changed cell
         board_diff_index = -1
@@ -243,17 +240,20 @@ def add_to_history(history, new_board_info, old_board_info):
         # add to history
         if board_diff_index > -1 and history and history[-1] == (diff_index, new_value, new_notes, new_color):
             history.pop()
+            return "pop"
         else:
             history.append((diff_index, old_value, old_notes, old_color))
+            return "push"
 
 def erase(sudoku, notes, colors, selected, history):
     board_old, _, notes_old, colors_old = copy_board_info(sudoku, notes, colors)
 
-    sudoku.board[selected] = 0
+    sudoku.set_cell(selected, 0)
     notes[selected] = []
     colors[selected] = None
 
-    add_to_history(history, (sudoku.board, notes, colors), (board_old, notes_old, colors_old))
+    operation = add_to_history(history, (sudoku.board, notes, colors), (board_old, notes_old, colors_old))
+    journal_move(sudoku, notes, colors, history, selected, operation)
 
 def set_value(sudoku, notes, colors, selected, note_mode, number, history, current_color):
     board_old, _, notes_old, colors_old = copy_board_info(sudoku, notes, colors)
@@ -271,11 +271,12 @@ def set_value(sudoku, notes, colors, selected, note_mode, number, history, curre
             if not notes[selected]:
                 colors[selected] = None
     else:
-        sudoku.board[selected] = number
+        sudoku.set_cell(selected, number)
         notes[selected] = []
         colors[selected] = current_color
 
-    add_to_history(history, (sudoku.board, notes, colors), (board_old, notes_old, colors_old))
+    operation = add_to_history(history, (sudoku.board, notes, colors), (board_old, notes_old, colors_old))
+    journal_move(sudoku, notes, colors, history, selected, operation)
 
 # transitions ------------------------------
 
@@ -318,6 +319,9 @@ def fade(is_out, time, sudoku = None, notes = None, colors = None, grid_shadow =
 
 if __name__ == "__main__":
 
+    # needed for the check pool processes in the built executable
+    multiprocessing.freeze_support()
+
     # pygame setup
     pygame.init()
     pygame.display.set_caption("Sudoku")
@@ -391,6 +395,13 @@ if __name__ == "__main__":
     # load eventual saved game
     sudoku, notes, colors, history = read_savegame()
 
+    # every generated puzzle is recorded in the store
+    puzzle_store = PuzzleStore()
+
+    # keep ready puzzles for the difficulty buttons (easy, medium, hard)
+    puzzle_pool = PuzzlePool([36, 18, 0], pool= check_pool(), store= puzzle_store)
+    puzzle_pool.start()
+
     # program loop
     while True:
 
@@ -404,8 +415,8 @@ if __name__ == "__main__":
         except:
             saved_sudoku = saved_board = saved_fixed = saved_notes = saved_colors = saved_history = None
 
-        # sudoku setup
-        sudoku = Sudoku()
+        # sudoku setup, explicit seed so the store can generate a live puzzle again like the pooled ones
+        sudoku = Sudoku(seed= random.getrandbits(32))
         notes = [[] for _ in range(81)]
         colors = [None] * 81
         note_mode = False
@@ -684,12 +695,20 @@ if __name__ == "__main__":
         # fade out before generation / sudoku start
         fade(True, 10, buttons= buttons + [input], current_color_table= current_color_table, text_rects= [(text, rectangle), (text_u, rectangle_u)], extra_surface= (layer if generate else None))
 
-        if generate:
+        pooled_sudoku = puzzle_pool.take(difficulty) if generate else None
+
+        if pooled_sudoku is not None:
+            print("Loaded sudoku from pool")
+            sudoku = pooled_sudoku
+        elif generate:
             # generate random sudoku
             pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_WAIT)
 
             print("Generating completed board...")
-            sudoku.generate_completed_board()
+            job = GenerationJob(sudoku, difficulty, pool= check_pool(), batch= True).start()
+            while not job.poll():
+                check_quit(pygame.event.get(), [job.thread], job.quit_signal, saved_sudoku, saved_notes, saved_colors, saved_history)
+                clock.tick(60)
             text = font.render("Generating solved sudoku", True, black)
             rectangle = text.get_rect(center = (width / 2, height / 2 - (font_size + 8)))
             # fade in for generation
@@ -712,17 +731,15 @@ if __name__ == "__main__":
             )
 
             print("Removing numbers...")
-            quit_signal = threading.Event()
-            thread = threading.Thread(target=sudoku.remove_board_numbers, args=(difficulty, True), kwargs={"quit_signal": quit_signal,})
-            thread.start()
-            while thread.is_alive():
+            counter = job.remaining
+            while not job.done():
                 screen.fill(white)
 
                 text_g = font.render("Solved sudoku generated", True, black)
                 text_r = font.render("Removing numbers...", True, black)
-                sudoku.atomic_lock.acquire()
-                counter = sudoku.atomic_counter
-                sudoku.atomic_lock.release()
+                for event, value in job.poll():
+                    if event == "remaining":
+                        counter = value
                 print(f"Remaining: {counter} ", end="\r")
                 text_p = font.render(f"Remaining: {counter}", True, black)
 
@@ -738,11 +755,23 @@ if __name__ == "__main__":
                 progress_bar.draw(screen, current_color_table)
 
                 events = pygame.event.get()
-                check_quit(events, [thread], quit_signal, saved_sudoku, saved_notes, saved_colors, saved_history)
+                check_quit(events, [job.thread], job.quit_signal, saved_sudoku, saved_notes, saved_colors, saved_history)
 
                 pygame.display.update()
                 clock.tick(60)
             print("\r             ")
+            # the pool stopped refilling on the miss so this job had the check pool to itself
+            puzzle_pool.resume()
+
+            # generation raised on the job thread (or gave no puzzle), keep the previous game and go back to the menu
+            if job.error is not None or job.result is None:
+                print(f"Generation failed: {job.error!r}")
+                text = font.render("Generation failed", True, black)
+                rectangle = text.get_rect(center = (width / 2, height / 2))
+                fade(True, 30, text_rects= [(text, rectangle)])
+                pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
+                sudoku, notes, colors, history = saved_sudoku, saved_notes, saved_colors, saved_history
+                continue
 
             # finished generating text (only shows during transition)
             screen.fill(white)
@@ -762,6 +791,7 @@ if __name__ == "__main__":
             # fade out after generation
             fade(True, 10, buttons= [progress_bar], current_color_table= current_color_table, text_rects= [(text_g, rectangle_g), (text_r, rectangle_r), (text_p, rectangle_p)])
 
+            puzzle_store.add(sudoku)
             pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
         elif resume_game:
             print(f"Resume game")
@@ -776,6 +806,9 @@ if __name__ == "__main__":
         sudoku.print()
         print(f"Code: {code}")
 
+        # snapshot of the new game, moves are journaled from here on
+        write_savegame(sudoku.board, sudoku.fixed, notes, colors, history)
+
         # button setup for game
         buttons = []
         # number buttons
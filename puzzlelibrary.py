@@ -0,0 +1,101 @@
+import mmap
+import os
+import struct
+from sudoku import Sudoku, encode_record, decode_record, record_size, solve_board, board_geometry
+
+# header: magic, format version, box size, flags, then fixed width records from encode_record
+MAGIC = b"SDKL"
+VERSION = 1
+HEADER = struct.Struct("<4sBBBx")
+FLAG_SOLUTIONS = 1
+
+def write_library(path, puzzles, with_solutions = False) -> int:
+    # write givens boards (or (givens, solution) pairs) to a library file, returns amount written
+    # missing solutions are solved when with_solutions is set, file is replaced atomically
+    file = open(f"{path}.tmp", "wb")
+    box = None
+    count = 0
+    try:
+        for puzzle in puzzles:
+            givens, solution = puzzle if isinstance(puzzle, tuple) else (puzzle, None)
+            if box is None:
+                box = board_geometry(givens).box
+                file.write(HEADER.pack(MAGIC, VERSION, box, FLAG_SOLUTIONS if with_solutions else 0))
+            elif board_geometry(givens).box != box:
+                raise ValueError("all puzzles in a library need the same size")
+            if not with_solutions:
+                solution = None
+            elif solution is None:
+                solution = solve_board(list(givens), 1)[0]
+            file.write(encode_record(givens, solution))
+            count += 1
+        if box is None:
+            file.write(HEADER.pack(MAGIC, VERSION, 3, FLAG_SOLUTIONS if with_solutions else 0))
+        file.close()
+    except BaseException:
+        file.close()
+        os.remove(f"{path}.tmp")
+        raise
+    os.replace(f"{path}.tmp", path)
+    return count
+
+class PuzzleLibrary:
+    # read only view of a library file, records are read from the memory map on access
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        try:
+            header = self.file.read(HEADER.size)
+            if len(header) < HEADER.size:
+                raise ValueError(f"{path} is not a puzzle library")
+            magic, version, box, flags = HEADER.unpack(header)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a puzzle library")
+            self.box = box
+            self.with_solutions = bool(flags & FLAG_SOLUTIONS)
+            self.record_size = record_size(box, self.with_solutions)
+            size = os.fstat(self.file.fileno()).st_size
+            if (size - HEADER.size) % self.record_size:
+                raise ValueError(f"{path} has a truncated record")
+            self.count = (size - HEADER.size) // self.record_size
+            # empty files can't be mapped
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if self.count else None
+        except BaseException:
+            self.file.close()
+            raise
+
+    def __len__(self) -> int:
+        return self.count
+
+    def record(self, n) -> bytes:
+        # raw bytes of the nth record
+        if n < 0:
+            n += self.count
+        if not 0 <= n < self.count:
+            raise IndexError("puzzle index out of range")
+        start = HEADER.size + n * self.record_size
+        return self.map[start:start + self.record_size]
+
+    def __getitem__(self, n) -> tuple[list[int], list[int]]:
+        # givens and solution (None without solutions) of the nth puzzle
+        return decode_record(self.record(n), self.box)
+
+    def __iter__(self):
+        for n in range(self.count):
+            yield self[n]
+
+    def sudoku(self, n) -> Sudoku:
+        sudoku = Sudoku(box= self.box)
+        sudoku.from_record(self.record(n), self.box)
+        return sudoku
+
+    def close(self) -> None:
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__(self) -> "PuzzleLibrary":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
@@ -0,0 +1,125 @@
+import threading
+import random
+import json
+import os
+from sudoku import Sudoku
+
+class PuzzlePool:
+    def __init__(self, difficulties, size = 5, path = "./data", pool = None, store = None):
+        self.difficulties = list(difficulties)
+        self.size = size # ready puzzles kept per difficulty
+        self.path = path
+        self.pool = pool # optional CheckPool for the removal checks
+        self.store = store # optional PuzzleStore recording every generated puzzle
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock() # one writer of pool.json.tmp at a time, take and refill both save
+        self.quit_signal = threading.Event()
+        self.wake = threading.Event()
+        self.running = threading.Event() # cleared while a live generation needs the check pool
+        self.running.set()
+        self.interrupt = threading.Event() # quit signal of the refill attempt in progress
+        self.thread = None
+        self.codes = {d: [] for d in self.difficulties}
+        self.load()
+
+    def load(self) -> None:
+        # read stored codes, unknown difficulties are ignored
+        if not os.path.exists(f"{self.path}/pool.json"):
+            return
+        try:
+            file = open(f"{self.path}/pool.json", "r")
+            data = json.load(file)
+            file.close()
+        except (OSError, ValueError):
+            return
+        for d in self.difficulties:
+            self.codes[d] = list(data.get(str(d), []))[:self.size]
+
+    def save(self) -> None:
+        # write to temporary file first so a crash never leaves a broken pool file
+        if not os.path.exists(f"{self.path}/"):
+            os.mkdir(self.path)
+        with self.save_lock:
+            # codes read inside the save lock so the last file written has the newest codes
+            with self.lock:
+                data = {str(d): codes[:] for d, codes in self.codes.items()}
+            file = open(f"{self.path}/pool.json.tmp", "w")
+            json.dump(data, file)
+            file.close()
+            os.replace(f"{self.path}/pool.json.tmp", f"{self.path}/pool.json")
+
+    def available(self, difficulty) -> int:
+        with self.lock:
+            return len(self.codes.get(difficulty, []))
+
+    def take(self, difficulty):
+        # ready puzzle for difficulty, None if pool is empty
+        # an empty pool pauses refilling so the caller's own generation gets the check pool, call resume after
+        while True:
+            with self.lock:
+                if not self.codes.get(difficulty):
+                    self.pause()
+                    return None
+                code = self.codes[difficulty].pop(0)
+            self.save()
+            self.wake.set()
+            sudoku = Sudoku()
+            if sudoku.from_string(code):
+                return sudoku
+
+    def start(self) -> None:
+        # keep refilling in the background until stop is called
+        if self.thread is not None:
+            return
+        self.quit_signal.clear()
+        self.thread = threading.Thread(target=self.refill, daemon=True)
+        self.thread.start()
+
+    def pause(self) -> None:
+        # stop submitting checks, the refill attempt in progress is dropped
+        self.running.clear()
+        self.interrupt.set()
+
+    def resume(self) -> None:
+        self.running.set()
+        self.wake.set()
+
+    def stop(self) -> None:
+        self.quit_signal.set()
+        self.interrupt.set()
+        self.wake.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def refill(self) -> None:
+        while not self.quit_signal.is_set():
+            self.wake.clear()
+            if not self.running.is_set():
+                self.wake.wait()
+                continue
+            # difficulty with least ready puzzles
+            with self.lock:
+                difficulty = min(self.difficulties, key=lambda d: len(self.codes[d]))
+                full = len(self.codes[difficulty]) >= self.size
+            if full:
+                self.wake.wait()
+                continue
+            # new signal per attempt, a set signal is never cleared so an interrupted search is never trusted
+            interrupt = threading.Event()
+            self.interrupt = interrupt
+            if not self.running.is_set() or self.quit_signal.is_set():
+                continue
+            # explicit seed, the store keeps it with sudoku.generation so the puzzle can be generated again
+            sudoku = Sudoku(seed= random.getrandbits(32))
+            board, _ = sudoku.generate_completed_board(interrupt)
+            if board is None:
+                continue
+            board, _ = sudoku.remove_board_numbers(difficulty, False, interrupt, pool= self.pool, batch= True)
+            if board is None:
+                continue
+            with self.lock:
+                self.codes[difficulty].append(sudoku.to_string())
+            self.save()
+            if self.store is not None:
+                self.store.add(sudoku)
@@ -0,0 +1,181 @@
+import sqlite3
+import threading
+import os
+import time
+import multiprocessing
+import json
+from sudoku import Sudoku, SolverStats, CheckPool, count_solutions
+
+# one row per equivalence class of puzzles, keyed by Sudoku.canonical_code
+SCHEMA = """
+create table if not exists puzzles (
+    code text primary key,
+    box integer not null,
+    clues integer not null,
+    level integer not null,
+    score integer not null,
+    seed integer,
+    nodes integer not null,
+    backtracks integer not null,
+    solve_time real not null,
+    created real not null,
+    generation text
+) without rowid;
+create index if not exists puzzles_score on puzzles (box, score);
+create index if not exists puzzles_clues on puzzles (box, clues);
+"""
+COLUMNS = ["code", "box", "clues", "level", "score", "seed", "nodes", "backtracks", "solve_time", "created", "generation"]
+
+def puzzle_row(sudoku, seed = None, stats = None, grade = None, generation = None) -> tuple:
+    # store row of a puzzle: canonical code, clue count, grade and solve stats
+    # stats (SolverStats) and grade already known from generation are used instead of solving again
+    # seed and generation (Sudoku.generation) are only stored together, see regenerate
+    if seed is None:
+        seed = sudoku.seed
+    if generation is None:
+        generation = sudoku.generation
+    givens = sudoku.givens()
+    if grade is None:
+        grade = sudoku.grade()
+    if stats is None:
+        stats = SolverStats()
+        count_solutions(givens, 2, sudoku.engine, stats)
+    return (
+        sudoku.canonical_code(),
+        sudoku.geometry.box,
+        len(givens) - givens.count(0),
+        grade.level,
+        grade.score,
+        seed if generation is not None else None,
+        stats.nodes,
+        stats.backtracks,
+        stats.wall_time,
+        time.time(),
+        json.dumps(generation) if seed is not None and generation is not None else None
+    )
+
+def row_work(job):
+    # puzzle_row on a worker process, Sudoku objects hold locks so only the givens are sent
+    givens, engine, seed, stats, grade, generation = job
+    sudoku = Sudoku(engine, seed= seed)
+    sudoku.board = givens
+    sudoku.fixed = [value != 0 for value in givens]
+    return puzzle_row(sudoku, seed, stats, grade, generation)
+
+def puzzle_job(puzzle) -> tuple:
+    # Sudoku or tuple (sudoku, seed, stats, grade) with the trailing items optional
+    if not isinstance(puzzle, tuple):
+        puzzle = (puzzle,)
+    sudoku, seed, stats, grade = puzzle + (None,) * (4 - len(puzzle))
+    return sudoku.givens(), sudoku.engine, sudoku.seed if seed is None else seed, stats, grade, sudoku.generation
+
+def regenerate(row) -> Sudoku:
+    # generate the puzzle of a row again from its seed and generation parameters, None if not stored
+    if row["seed"] is None or row["generation"] is None:
+        return None
+    generation = json.loads(row["generation"])
+    sudoku = Sudoku(box= row["box"], seed= row["seed"])
+    sudoku.generate_completed_board()
+    pool = CheckPool(generation["workers"]) if generation["removal"] == "pool" else None
+    try:
+        arguments = {
+            "multithread": generation["removal"] == "threads",
+            "pool": pool,
+            "batch": generation["batch"],
+            "max_threads": generation["workers"]
+        }
+        if generation["minimal"]:
+            sudoku.make_minimal(**arguments)
+        else:
+            sudoku.remove_board_numbers(generation["end"], clues= generation["clues"], **arguments)
+    finally:
+        if pool is not None:
+            pool.close()
+    return sudoku
+
+class PuzzleStore:
+    def __init__(self, path = "./data/puzzles.db"):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.mkdir(folder)
+        self.lock = threading.Lock()
+        # shared with the puzzle pool thread, every use goes through lock
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("pragma journal_mode = wal")
+        self.connection.execute("pragma synchronous = normal")
+        self.connection.executescript(SCHEMA)
+        # stores from before the generation column
+        columns = [row[1] for row in self.connection.execute("pragma table_info(puzzles)")]
+        if "generation" not in columns:
+            self.connection.execute("alter table puzzles add column generation text")
+
+    def add(self, sudoku, seed = None, stats = None, grade = None) -> str:
+        # store puzzle unless an equivalent one is stored, returns its canonical code
+        row = puzzle_row(sudoku, seed, stats, grade)
+        self.insert_many([row])
+        return row[0]
+
+    def add_many(self, puzzles, workers = None, chunksize = 16, batch = 1000) -> int:
+        # store Sudoku objects or (sudoku, seed, stats, grade) tuples, returns amount added
+        # rows are built on worker processes like solve_many and inserted one transaction per batch
+        jobs = (puzzle_job(puzzle) for puzzle in puzzles)
+        if workers == 1:
+            return self.insert_stream((row_work(job) for job in jobs), batch)
+        with multiprocessing.Pool(workers) as pool:
+            return self.insert_stream(pool.imap_unordered(row_work, jobs, chunksize), batch)
+
+    def insert_stream(self, rows, batch = 1000) -> int:
+        added = 0
+        pending = []
+        for row in rows:
+            pending.append(row)
+            if len(pending) >= batch:
+                added += self.insert_many(pending)
+                pending = []
+        return added + self.insert_many(pending)
+
+    def insert_many(self, rows) -> int:
+        # store ready rows from puzzle_row, duplicates are skipped
+        with self.lock, self.connection:
+            before = self.connection.total_changes
+            self.connection.executemany(
+                f"insert or ignore into puzzles values ({', '.join('?' * len(COLUMNS))})", rows
+            )
+            return self.connection.total_changes - before
+
+    def get(self, code):
+        # row of the stored puzzle equivalent to code as a dict, None if there is none
+        sudoku = Sudoku()
+        if not sudoku.from_string(code, "syntax"):
+            return None
+        rows = self.query("where code = ?", (sudoku.canonical_code(),))
+        return rows[0] if rows else None
+
+    def __contains__(self, code) -> bool:
+        return self.get(code) is not None
+
+    def by_score(self, low, high, box = 3, limit = 100) -> list[dict]:
+        # puzzles with grade score in [low, high], easiest first
+        return self.query("where box = ? and score between ? and ? order by score limit ?", (box, low, high, limit))
+
+    def by_clues(self, low, high, box = 3, limit = 100) -> list[dict]:
+        return self.query("where box = ? and clues between ? and ? order by clues limit ?", (box, low, high, limit))
+
+    def query(self, where, parameters = ()) -> list[dict]:
+        with self.lock:
+            rows = self.connection.execute(f"select * from puzzles {where}", parameters).fetchall()
+        return [dict(zip(COLUMNS, row)) for row in rows]
+
+    def sudoku(self, row) -> Sudoku:
+        # puzzle of a row from the queries
+        sudoku = Sudoku()
+        sudoku.from_string(row["code"], "syntax")
+        return sudoku
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.connection.execute("select count(*) from puzzles").fetchone()[0]
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
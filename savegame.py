@@ -0,0 +1,101 @@
+import json
+import os
+
+class Savegame:
+    # compact snapshot plus an append only journal with one line per move,
+    # moves cost one appended line and the snapshot is rewritten once the journal outgrows it
+    def __init__(self, path = "./data"):
+        self.path = path
+        self.sequence = 0 # number of the last move written
+        self.moves = 0 # journal lines since the snapshot
+        self.snapshot_size = 0 # cells and history entries in the snapshot
+        self.journal = None
+
+    def read(self):
+        # (board, fixed, notes, colors, history) with the journal replayed, None if there is no game
+        if not os.path.exists(f"{self.path}/"):
+            os.mkdir(self.path)
+        if not os.path.exists(f"{self.path}/savegame.json"):
+            return None
+        file = open(f"{self.path}/savegame.json", "r")
+        data = json.load(file)
+        file.close()
+        board = data["board"]
+        fixed = data["fixed"]
+        notes = data["notes"]
+        colors = data["colors"]
+        history = [tuple(entry) for entry in data["history"]]
+        # savegames from before the journal have no sequence
+        self.sequence = data.get("sequence", 0)
+        self.moves = 0
+        if os.path.exists(f"{self.path}/savegame.journal"):
+            file = open(f"{self.path}/savegame.journal", "r")
+            for line in file:
+                try:
+                    move = json.loads(line)
+                except ValueError:
+                    # unfinished last line of a crash
+                    break
+                # moves already in the snapshot when the journal was not cleared yet
+                if move[0] <= self.sequence:
+                    continue
+                sequence, index, value, cell_notes, color, operation = move[:6]
+                board[index] = value
+                notes[index] = cell_notes
+                colors[index] = color
+                if operation == "push":
+                    history.append(tuple(move[6]))
+                else:
+                    history.pop()
+                self.sequence = sequence
+                self.moves += 1
+            file.close()
+        self.snapshot_size = len(board) + len(history) - self.moves
+        return board, fixed, notes, colors, history
+
+    def write(self, board, fixed, notes, colors, history) -> None:
+        # replace snapshot atomically, then start an empty journal
+        if not os.path.exists(f"{self.path}/"):
+            os.mkdir(self.path)
+        data = {
+            "sequence": self.sequence,
+            "board": board,
+            "fixed": fixed,
+            "notes": notes,
+            "colors": colors,
+            "history": history
+        }
+        file = open(f"{self.path}/savegame.json.tmp", "w")
+        json.dump(data, file, separators= (",", ":"))
+        file.flush()
+        os.fsync(file.fileno())
+        file.close()
+        os.replace(f"{self.path}/savegame.json.tmp", f"{self.path}/savegame.json")
+        # after a crash right here the old journal is still there, its lines are skipped by sequence
+        if self.journal is not None:
+            self.journal.close()
+        self.journal = open(f"{self.path}/savegame.journal", "w")
+        self.moves = 0
+        self.snapshot_size = len(board) + len(history)
+
+    def record(self, board, fixed, notes, colors, history, index, operation) -> None:
+        # append the move that changed cell index, operation is "push" or "pop" for what it did to history,
+        # compacting once the journal has more lines than the snapshot has entries
+        if self.journal is None:
+            # no journal opened by this session yet, state already contains the move
+            self.write(board, fixed, notes, colors, history)
+            return
+        self.sequence += 1
+        move = [self.sequence, index, board[index], notes[index], colors[index], operation]
+        if operation == "push":
+            move.append(history[-1])
+        self.journal.write(json.dumps(move, separators= (",", ":")) + "\n")
+        self.journal.flush()
+        self.moves += 1
+        if self.moves > self.snapshot_size:
+            self.write(board, fixed, notes, colors, history)
+
+    def close(self) -> None:
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
@@ -1,223 +1,404 @@
 import random
 import threading
+import queue
+import multiprocessing
 import os
+import sys
+import time
+import argparse
+import itertools
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
 
 #sudoku class ----------------------------
 
 class Sudoku:
-    def __init__(self):
+    def __init__(self, engine = "bitmask", box = 3, seed = None, rng = None):
+        self.engine = engine # solver used for uniqueness checks, see SOLVERS
+        self.seed = seed
+        self.generation = None # removal parameters that repeat the puzzle together with seed, see remove_board_numbers
+        self.rng = rng if rng is not None else random.Random(seed) # same seed -> same puzzle
         self.mutex = threading.Lock()
-        self.atomic_lock = threading.Lock()
-        self.atomic_counter = 0
-
-        self.board = [0] * 81
-        self.fixed = [True] * 81
-
-    def generate_completed_board(self) -> tuple[list[int], list[bool]]:
-        # generate a solved sudoku
-        row = 0
-        stuck_row = 0
-        stuck_counter = 0
-        while not full_board(self.board):
-            try:
-                for i in range(9):
-                    # set cell to random from available
-                    available = get_available(self.board, row * 9 + i)
-                    self.board[row * 9 + i] = random.choice(available)
-                row += 1
-                if row - stuck_row >= 2:
-                    stuck_row = row
-                else:
-                    stuck_counter += 1
-                if stuck_counter > 100:
-                    # start over if stuck
-                    self.board = [0] * 81
-                    row = 0
-                    stuck_row = 0
-                    stuck_counter = 0
-            except:
-                # out of options, go back one row
-                for i in range(9):
-                    self.board[row * 9 + i] = 0
-                row -= 1
+
+        self.board = [0] * geometry(box).cells
+        self.fixed = [True] * geometry(box).cells
+
+    @property
+    def board(self) -> list[int]:
+        # copy of the values, writes to it never reach the index, cells are written with set_cell
+        # and whole boards by assigning board
+        return self.index.board[:]
+
+    @board.setter
+    def board(self, board):
+        self.index = BoardIndex(board)
+
+    @property
+    def geometry(self) -> "Geometry":
+        return self.index.geometry
+
+    def set_cell(self, index, value) -> None:
+        self.index.set(index, value)
+
+    def generate_completed_board(self, quit_signal = None) -> tuple[list[int], list[bool]]:
+        # generate a solved sudoku by solving the current board with values tried in random order,
+        # restarting with a doubled node budget when an unlucky start runs long
+        # returns None, None if quit_signal got set
+        if not self.valid():
+            raise ValueError("board has conflicting values")
+        budget = self.geometry.cells
+        solutions = []
+        while not solutions:
+            state = BoardState(self.board)
+            state.rng = self.rng
+            state.budget = budget
+            state.quit_signal = quit_signal
+            search_board(state, 1, solutions)
+            if quit_signal is not None and quit_signal.is_set():
+                return None, None
+            if not solutions and state.budget >= 0:
+                raise ValueError("board has no solution to complete")
+            budget *= 2
+        self.board = solutions[0]
         return self.board, self.fixed
 
-    def remove_board_numbers(self, end = 0, multithread = True, quit_signal = None) -> tuple[list[int], list[bool]]:
+    def remove_board_numbers(self, end = 0, multithread = True, quit_signal = None, stats = None, pool = None, batch = False, progress = None, clues = None, max_threads = None) -> tuple[list[int], list[bool]]:
         # remove numbers randomly until limit for how many numbers to check is reached
-        remaining = [i for i in range(81)]
-        random.shuffle(remaining)
+        # stats list -> gets one SolverStats per removal attempt
+        # pool -> CheckPool used for the checks instead of threads
+        # batch -> commit all parallel options at once instead of only the first
+        # progress -> called with the amount of cells left to check before every round
+        # quit_signal is also checked inside the solver, once set the board is left unfinished and None, None returned
+        # clues -> also stop once at most this many values are left
+        # max_threads -> thread limit of the threaded checks, os.cpu_count() up to 8 if not set
+        if pool is not None:
+            removal, workers = "pool", pool.workers
+        elif multithread:
+            removal, workers = "threads", max_threads if max_threads else min(os.cpu_count(), 8)
+        else:
+            removal, workers = "sequential", 1
+        # the removed cells depend on all of these, not only on the seed
+        self.generation = {"end": end, "clues": clues, "removal": removal, "workers": workers, "batch": batch, "minimal": False}
+        cells = self.geometry.cells
+        remaining = [i for i in range(cells)]
+        self.rng.shuffle(remaining)
         while len(remaining) > end:
             if quit_signal is not None and quit_signal.is_set():
                 return None, None
-            self.atomic_lock.acquire()
-            self.atomic_counter = len(remaining) - end
-            self.atomic_lock.release()
-            if multithread:
+            if clues is not None and cells - self.index.empty <= clues:
+                break
+            if progress is not None:
+                progress(len(remaining) - end)
+            # cells a round may check, batch mode can commit all of them so none may pass end or clues
+            room = len(remaining) - end
+            if clues is not None:
+                room = min(room, cells - self.index.empty - clues)
+            if pool is not None:
+                # check one cell per worker process
+                count = min(pool.workers, room)
+                taken = remaining[-count:]
+                del remaining[-count:]
+                results = pool.check(self.board, taken, self.engine, quit_signal, stats is not None)
+                if results is None:
+                    return None, None
+                options = []
+                for cell, removable, attempt in results:
+                    if removable:
+                        options.append(cell)
+                    if attempt is not None:
+                        stats.append(attempt)
+                # cells that can't be removed now never can, removable ones are checked again later
+                remaining.extend(options)
+                self.commit_options(options, remaining, batch, stats, quit_signal)
+            elif multithread:
                 threads = []
                 options = []
                 # start looking for multiple values to remove simultaneously
-                thread_limit = os.cpu_count()
-                if thread_limit > 8:
-                    thread_limit = 8
+                thread_limit = workers
                 num_remaining = len(remaining)
                 if num_remaining > 32:
                     num_threads = 1
-                elif num_remaining > thread_limit:
-                    num_threads = thread_limit
                 else:
-                    num_threads = num_remaining
+                    num_threads = min(thread_limit, room)
+                taken = remaining[-num_threads:]
                 for _ in range(num_threads):
-                    t = threading.Thread(target=thread_work, args=(self.board[:], remaining, options, self.mutex,))
+                    t = threading.Thread(target=thread_work, args=(self.board, remaining, options, self.mutex, self.engine, stats, quit_signal,))
                     t.start()
                     threads.append(t)
                 for t in threads:
                     t.join()
-                # remove first option
-                if options:
-                    remove = options[0]
-                    self.board[remove] = 0
-                    self.fixed[remove] = False
-                    remaining.remove(remove)
+                if quit_signal is not None and quit_signal.is_set():
+                    return None, None
+                # put options back in the order they were taken, independent of thread timing
+                options.sort(key=taken.index)
+                del remaining[len(remaining) - len(options):]
+                remaining.extend(options)
+                self.commit_options(options, remaining, batch, stats, quit_signal)
             else:
-                remove = random.choice(remaining)
+                remove = self.rng.choice(remaining)
                 remaining.remove(remove)
-                old_value = self.board[remove]
-                self.board[remove] = 0
-                if (len(solve_board(self.board[:])) > 1):
+                old_value = self.index.board[remove]
+                self.set_cell(remove, 0)
+                attempt = None if stats is None else SolverStats(remove)
+                unique = has_unique_solution(self.board, engine= self.engine, stats= attempt, quit_signal= quit_signal)
+                if quit_signal is not None and quit_signal.is_set():
+                    return None, None
+                if not unique:
                     # board value cant be removed
-                    self.board[remove] = old_value
+                    self.set_cell(remove, old_value)
                 else:
                     # finish removing value
                     self.fixed[remove] = False
+                    if attempt is not None:
+                        attempt.removed = True
+                if attempt is not None:
+                    stats.append(attempt)
         return self.board, self.fixed
 
+    def make_minimal(self, multithread = True, quit_signal = None, stats = None, pool = None, batch = False, max_threads = None) -> tuple[list[int], list[bool]]:
+        # remove numbers until no clue can be removed without losing uniqueness
+        board, fixed = self.remove_board_numbers(0, multithread, quit_signal, stats, pool, batch, max_threads= max_threads)
+        if board is None:
+            return None, None
+        self.generation["minimal"] = True
+        # a clue that failed its check stays needed as more clues go, so this pass
+        # normally finds nothing, but it makes minimal a guarantee instead of a side effect
+        while True:
+            cells = removable_clues(self.board, 1, quit_signal)
+            if quit_signal is not None and quit_signal.is_set():
+                return None, None
+            if not cells:
+                return self.board, self.fixed
+            self.set_cell(cells[0], 0)
+            self.fixed[cells[0]] = False
+
+    def commit_options(self, options, remaining, batch, stats = None, quit_signal = None) -> None:
+        # remove the first option, or as many options as possible in batch mode
+        if not options:
+            return
+        if not batch:
+            committed = options[:1]
+            self.set_cell(committed[0], 0)
+            self.fixed[committed[0]] = False
+        else:
+            rejected = []
+            # options were each checked by a worker against the current board
+            committed = self.commit_removals(options, rejected, stats, quit_signal, True)
+            for cell in rejected:
+                remaining.remove(cell)
+        for cell in committed:
+            remaining.remove(cell)
+
+    def commit_removals(self, cells, rejected = None, stats = None, quit_signal = None, checked = False) -> list[int]:
+        # empty all cells with one uniqueness check, bisecting the batch if the check fails
+        # single cells that fail are added to rejected, returns the emptied cells
+        # checked -> every cell alone was already found removable on the board as it is now
+        if checked and len(cells) == 1:
+            self.set_cell(cells[0], 0)
+            self.fixed[cells[0]] = False
+            return cells[:]
+        values = [self.index.board[cell] for cell in cells]
+        for cell in cells:
+            self.set_cell(cell, 0)
+        attempt = None if stats is None else SolverStats(cells[:])
+        unique = has_unique_solution(self.board, engine= self.engine, stats= attempt, quit_signal= quit_signal)
+        if quit_signal is not None and quit_signal.is_set():
+            return []
+        if attempt is not None:
+            attempt.removed = unique
+            stats.append(attempt)
+        if unique:
+            for cell in cells:
+                self.fixed[cell] = False
+            return cells[:]
+        for cell, value in zip(cells, values):
+            self.set_cell(cell, value)
+        if len(cells) == 1:
+            if rejected is not None:
+                rejected.append(cells[0])
+            return []
+        half = len(cells) // 2
+        first = self.commit_removals(cells[:half], rejected, stats, quit_signal, checked)
+        # the board only stays as checked if the first half removed nothing
+        return first + self.commit_removals(cells[half:], rejected, stats, quit_signal, checked and not first)
+
     def valid(self) -> bool:
-        return valid_board(self.board)
+        return self.index.conflicts == 0
 
     def full(self) -> bool:
-        return full_board(self.board)
+        return self.index.empty == 0
+
+    def conflicts(self, index) -> int:
+        # non-zero exactly when conflicts(board, index, board[index]) is, row reported first
+        return self.index.cell_conflicts(index)
+
+    def available(self, index) -> list[int]:
+        # values not used by the cells sharing row, column or box with index
+        return mask_digits(self.index.candidates(index))[:]
 
     def print(self) -> None:
         print_board(self.board)
 
     def to_string(self) -> str:
+        # 9x9 codes have no prefix, other sizes start with the box size
+        size = self.geometry.size
+        prefix = "" if self.geometry.box == 3 else str(self.geometry.box)
+        givens = self.givens()
         # row based string
-        str_r = "r"
-        zero_r = 0
-        for r in range(9):
-            for c in range(9):
-                index = r * 9 + c
-                if self.fixed[index]:
-                    value_r = self.board[index]
-                else:
-                    value_r = 0
-                if value_r == 0:
-                    zero_r += 1
-                    if c < 8 or r < 8:
-                        continue
-                if zero_r > 2:
-                    str_r += f"{hex(zero_r)}"
-                elif zero_r == 2:
-                    str_r += "d"
-                else:
-                    str_r += "0" * zero_r
-                if value_r != 0:
-                    zero_r = 0
-                    str_r += str(value_r)
+        str_r = prefix + "r" + encode_values(givens, size)
         # column based string
-        str_c = "c"
-        zero_c = 0
-        for c in range(9):
-            for r in range(9):
-                index = r * 9 + c
-                if self.fixed[index]:
-                    value_c = self.board[index]
-                else:
-                    value_c = 0
-                if value_c == 0:
-                    zero_c += 1
-                    if c < 8 or r < 8:
-                        continue
-                if zero_c > 2:
-                    str_c += f"{hex(zero_c)}"
-                elif zero_c == 2:
-                    str_c += "d"
-                else:
-                    str_c += "0" * zero_c
-                if value_c != 0:
-                    zero_c = 0
-                    str_c += str(value_c)
+        str_c = prefix + "c" + encode_values([givens[r * size + c] for c in range(size) for r in range(size)], size)
         # return shortest option
         return str_r if len(str_r) <= len(str_c) else str_c
 
-    def from_string(self, string) -> bool:
-        board = [0] * 81
-        fixed = [False] * 81
-        if not string:
-            return False
-        direction = string[0]
-        # not valid direction
-        if direction not in ["r", "c"]:
-            return False
-        i = 1
-        counter = 0
-        while i < len(string):
-            # too many cells
-            if counter >= 81:
+    def to_record(self, with_solution = False) -> bytes:
+        # fixed width binary form of the givens, see encode_record
+        givens = self.givens()
+        solution = solve_board(givens, 1, engine= self.engine)[0] if with_solution else None
+        return encode_record(givens, solution)
+
+    def from_record(self, data, box = 3) -> None:
+        # givens of a record from to_record, values are range checked by decode_record but not validated
+        givens, _ = decode_record(data, box)
+        self.board = givens
+        self.fixed = [value != 0 for value in givens]
+
+    def from_string(self, string, level = "unique") -> bool:
+        # level -> checks done before the code is accepted, see CODE_LEVELS
+        # codes that passed a level before come from verified_codes without parsing or solving
+        required = CODE_LEVELS.index(level)
+        cached = verified_codes.get(string, required)
+        if cached is not None:
+            board, fixed = cached
+        else:
+            parsed = parse_code(string)
+            if parsed is None:
                 return False
-            # invalid symbol
-            if not string[i].isnumeric() and string[i] != "d":
+            board, fixed = parsed
+            # invalid board
+            if required >= 1 and not valid_board(board):
                 return False
-            if string[i] == "d":
-                # exactly 2 zeros in a row
-                counter += 1
-            elif string[i] != "0":
-                # not 0
-                if direction == "r":
-                    # row direction
-                    board[counter] = int(string[i])
-                    fixed[counter] = True
-                else:
-                    # column direction
-                    board[(counter * 9 + counter // 9) % 81] = int(string[i])
-                    fixed[(counter * 9 + counter // 9) % 81] = True
-            elif i < len(string) - 1 and string[i + 1] == "x":
-                # more than 2 zeros in a row
-                if string[i + 2] not in ["1", "2"]:
-                    counter += int(string[i:i+3], base=0)
-                    i += 3
-                else:
-                    # >=16 zeros in a row
-                    counter += int(string[i:i+4], base=0)
-                    i += 4
-                continue
-            i += 1
-            counter += 1
-        # incorrect number of cells
-        if counter != 81:
-            return False
-        # invalid board
-        if not valid_board(board) or len(solve_board(board[:])) != 1:
-            return False
+            if required >= 2 and not has_unique_solution(board, engine= self.engine):
+                return False
+            verified_codes.put(string, required, board, fixed)
         # set board if valid
-        self.board = board
-        self.fixed = fixed
+        self.board = list(board)
+        self.fixed = list(fixed)
         return True
 
     def solve(self) -> None:
-        self.board = solve_board(self.board[:], 1)[0]
+        self.board = solve_board(self.board, 1, engine= self.engine)[0]
+
+    def givens(self) -> list[int]:
+        return [value if fixed else 0 for value, fixed in zip(self.board, self.fixed)]
+
+    def grade(self, max_level = None) -> "Grade":
+        return grade_board(self.givens(), max_level)
+
+    def generate_graded(self, level, end = 0, attempts = 100, multithread = False, pool = None):
+        # generate puzzles until one grades at level (index or name in GRADE_LEVELS), None if attempts run out
+        if isinstance(level, str):
+            level = GRADE_LEVELS.index(level)
+        cells = self.geometry.cells
+        for _ in range(attempts):
+            self.board = [0] * cells
+            self.fixed = [True] * cells
+            self.generate_completed_board()
+            self.remove_board_numbers(end, multithread, pool= pool, batch= pool is not None)
+            # grading stops at the first technique harder than level, so hard misses are cheap
+            grade = self.grade(level)
+            if grade.level == level and grade.solved:
+                return grade
+        return None
+
+    def transform(self, relabel = None, rows = None, cols = None, transpose = False) -> "Sudoku":
+        # equivalent puzzle, same uniqueness and difficulty without solving again
+        # new row r is old row rows[r], new column c is old column cols[c] (after transposing),
+        # value v becomes relabel[v - 1]
+        box = self.geometry.box
+        size = self.geometry.size
+        relabel = list(relabel) if relabel is not None else list(range(1, size + 1))
+        rows = list(rows) if rows is not None else list(range(size))
+        cols = list(cols) if cols is not None else list(range(size))
+        if sorted(relabel) != list(range(1, size + 1)):
+            raise ValueError("relabel has to be a permutation of the values")
+        for perm in [rows, cols]:
+            if sorted(perm) != list(range(size)) or any(
+                len({perm[band * box + i] // box for i in range(box)}) != 1 for band in range(box)
+            ):
+                raise ValueError("rows and columns can only move within bands and stacks, or as whole bands and stacks")
+        board = [0] * self.geometry.cells
+        fixed = [False] * self.geometry.cells
+        for r in range(size):
+            for c in range(size):
+                source = cols[c] * size + rows[r] if transpose else rows[r] * size + cols[c]
+                value = self.index.board[source]
+                board[r * size + c] = relabel[value - 1] if value else 0
+                fixed[r * size + c] = self.fixed[source]
+        sudoku = Sudoku(self.engine, box, rng= self.rng)
+        sudoku.board = board
+        sudoku.fixed = fixed
+        return sudoku
+
+    def canonical(self) -> "Sudoku":
+        # minlex representative of the puzzle's equivalence class under transform, see canonical_form
+        relabel, rows, cols, transpose = canonical_form(self.givens())
+        return self.transform(relabel, rows, cols, transpose)
+
+    def canonical_code(self) -> str:
+        # same code for every transform of the puzzle, for deduplication
+        return self.canonical().to_string()
+
+    def random_transform(self) -> "Sudoku":
+        # transform with a random relabelling, band/stack and row/column order and transposition
+        box = self.geometry.box
+        size = self.geometry.size
+        relabel = list(range(1, size + 1))
+        self.rng.shuffle(relabel)
+        perms = []
+        for _ in range(2):
+            bands = list(range(box))
+            self.rng.shuffle(bands)
+            perm = []
+            for band in bands:
+                lines = [band * box + i for i in range(box)]
+                self.rng.shuffle(lines)
+                perm += lines
+            perms.append(perm)
+        return self.transform(relabel, perms[0], perms[1], self.rng.random() < 0.5)
+
+    def variants(self, count, max_tries = None):
+        # yield up to count transformed puzzles with distinct codes, different from this one
+        seen = {self.to_string()}
+        tries = max_tries if max_tries is not None else count * 10
+        while count > 0 and tries > 0:
+            tries -= 1
+            sudoku = self.random_transform()
+            code = sudoku.to_string()
+            if code in seen:
+                continue
+            seen.add(code)
+            count -= 1
+            yield sudoku
 
     def best_next_option(self) -> tuple[int, tuple[int, int, list[int], list[str]]]:
+        if numpy is not None:
+            return self.best_next_option_vectorized()
+        size = self.geometry.size
+        box = self.geometry.box
         analysis_list = []
         # get all possible options for all empty cells
-        for i in range(81):
-            row = i // 9
-            col = i % 9
+        for i in range(self.geometry.cells):
+            row = i // size
+            col = i % size
             # check if cell empty
-            if self.board[i] != 0:
+            if self.index.board[i] != 0:
                 continue
             # get possible numbers and reasoning
-            available, messages = get_available_analysis(self.board, i)
+            available, messages = get_available_analysis(self.index.board, i)
             # push to list of all possibilities
             analysis_list.append((row, col, available, messages))
         # return first option that only has one possible
@@ -232,7 +413,7 @@ class Sudoku:
                 (
                     this[0] == other[0] or # sharing row
                     this[1] == other[1] or # sharing column
-                    (this[0] // 3 == other[0] // 3) and (this[1] // 3 == other[1] // 3) # sharing box
+                    (this[0] // box == other[0] // box) and (this[1] // box == other[1] // box) # sharing box
                 ) and
                 this[2] == other[2] # same options
                 for other in two_guess_options
@@ -249,100 +430,1028 @@ class Sudoku:
         else:
             return None, None
 
+    def best_next_option_vectorized(self) -> tuple[int, tuple[int, int, list[int], list[str]]]:
+        # same choice as best_next_option, analysis only run for the chosen cell
+        candidates = candidate_matrix(self.board)
+        amounts = candidates.sum(axis=1)
+        singles = numpy.flatnonzero((amounts == 1) | hidden_single_matrix(candidates).any(axis=1))
+        if singles.size:
+            kind, index = 0, singles[0]
+        else:
+            pairs = numpy.flatnonzero(pair_matrix(candidates))
+            two = numpy.flatnonzero(amounts == 2)
+            empty = numpy.flatnonzero(numpy.asarray(self.board) == 0)
+            if pairs.size:
+                kind, index = 1, pairs[0]
+            elif two.size:
+                kind, index = 2, two[0]
+            elif empty.size:
+                kind, index = 3, empty[0]
+            else:
+                return None, None
+        index = int(index)
+        size = self.geometry.size
+        available, messages = get_available_analysis(self.board, index)
+        return (kind, (index // size, index % size, available, messages))
+
+#board geometry ---------------------------
+
+class Geometry:
+    # lookup tables for a board of box x box boxes, each box and unit holding size = box * box cells
+    def __init__(self, box):
+        size = box * box
+        cells = size * size
+        self.box = box
+        self.size = size
+        self.cells = cells
+        self.all_digits = (1 << (size + 1)) - 2 # bit n set -> digit n possible
+        self.row_of = [i // size for i in range(cells)]
+        self.col_of = [i % size for i in range(cells)]
+        self.box_of = [(i // (size * box)) * box + (i % size) // box for i in range(cells)]
+        self.row_cells = [tuple(r * size + c for c in range(size)) for r in range(size)]
+        self.col_cells = [tuple(r * size + c for r in range(size)) for c in range(size)]
+        self.box_cells = [tuple(i for i in range(cells) if self.box_of[i] == b) for b in range(size)]
+        self.units = self.row_cells + self.col_cells + self.box_cells
+        self.peers = [
+            tuple(sorted(set(self.row_cells[self.row_of[i]] + self.col_cells[self.col_of[i]] + self.box_cells[self.box_of[i]]) - {i}))
+            for i in range(cells)
+        ]
+        self.dlx_template = None # built on first dancing links solve
+        self.np_tables = None # built on first vectorized analysis
+
+GEOMETRIES = {}
+BOARD_GEOMETRIES = {}
+CODE_BOXES = [2, 3, 4, 5] # box sizes with single symbol values in codes
+
+def geometry(box = 3) -> Geometry:
+    if box not in GEOMETRIES:
+        GEOMETRIES[box] = Geometry(box)
+    return GEOMETRIES[box]
+
+def board_geometry(board) -> Geometry:
+    # geometry matching the amount of cells in board
+    cells = len(board)
+    if cells not in BOARD_GEOMETRIES:
+        box = round(cells ** 0.25)
+        if box < 1 or box ** 4 != cells:
+            raise ValueError(f"{cells} cells do not make a sudoku board")
+        BOARD_GEOMETRIES[cells] = geometry(box)
+    return BOARD_GEOMETRIES[cells]
+
+# lookup from candidate mask to digits for boards up to 9x9
+MASK_DIGITS = [[n for n in range(1, 10) if mask >> n & 1] for mask in range(1024)]
+
+def mask_digits(mask) -> list[int]:
+    if mask < 1024:
+        return MASK_DIGITS[mask]
+    digits = []
+    while mask:
+        low = mask & -mask
+        digits.append(low.bit_length() - 1)
+        mask ^= low
+    return digits
+
+def value_symbol(value, size) -> str:
+    # digits up to 9x9, letters from A on larger boards
+    return str(value) if size <= 9 else chr(ord("A") + value - 1)
+
+def symbol_value(symbol, size):
+    # value of a code symbol, None if not a value
+    if size <= 9:
+        if "1" <= symbol <= "9" and int(symbol) <= size:
+            return int(symbol)
+    elif "A" <= symbol <= "Z" and ord(symbol) - ord("A") < size:
+        return ord(symbol) - ord("A") + 1
+    return None
+
+def encode_values(values, size) -> str:
+    # run-length code, 2 empty cells as "d" and more as their hex amount
+    code = ""
+    zeros = 0
+    last = len(values) - 1
+    for n, value in enumerate(values):
+        if value == 0:
+            zeros += 1
+            if n < last:
+                continue
+        if zeros > 2:
+            code += f"{hex(zeros)}"
+        elif zeros == 2:
+            code += "d"
+        else:
+            code += "0" * zeros
+        if value != 0:
+            zeros = 0
+            code += value_symbol(value, size)
+    return code
+
+# syntax: code can be decoded, consistency: no conflicting values, unique: exactly one solution
+CODE_LEVELS = ["syntax", "consistency", "unique"]
+
+def parse_code(string):
+    # board and fixed of a code from Sudoku.to_string, None if it can't be decoded
+    if not string:
+        return None
+    box = 3
+    if string[0].isdigit():
+        box = int(string[0])
+        string = string[1:]
+        if box not in CODE_BOXES or not string:
+            return None
+    size = box * box
+    cells = size * size
+    board = [0] * cells
+    fixed = [False] * cells
+    direction = string[0]
+    # not valid direction
+    if direction not in ["r", "c"]:
+        return None
+    i = 1
+    counter = 0
+    while i < len(string):
+        # too many cells
+        if counter >= cells:
+            return None
+        value = symbol_value(string[i], size)
+        # invalid symbol
+        if value is None and string[i] != "d" and string[i] != "0":
+            return None
+        if string[i] == "d":
+            # exactly 2 zeros in a row
+            counter += 1
+        elif value:
+            # not 0
+            if direction == "r":
+                # row direction
+                index = counter
+            else:
+                # column direction
+                index = (counter * size + counter // size) % cells
+            board[index] = value
+            fixed[index] = True
+        elif i < len(string) - 1 and string[i + 1] == "x":
+            # more than 2 zeros in a row
+            if size > 9:
+                # values are letters, hex amount ends at first non hex symbol
+                end = i + 2
+                while end < len(string) and string[end] in "0123456789abcdef":
+                    end += 1
+            elif i + 2 < len(string) and string[i + 2] not in ["1", "2"]:
+                end = i + 3
+            else:
+                # >=16 zeros in a row
+                end = i + 4
+            try:
+                counter += int(string[i:end], base=0)
+            except ValueError:
+                return None
+            i = end
+            continue
+        i += 1
+        counter += 1
+    # incorrect number of cells
+    if counter != cells:
+        return None
+    return board, fixed
+
+def cell_bits(size) -> int:
+    # bits per packed cell value, 4 for 9x9
+    return size.bit_length()
+
+def record_size(box = 3, with_solution = False) -> int:
+    # bytes of one record from encode_record
+    size = box * box
+    packed = (size * size * cell_bits(size) + 7) // 8
+    return packed * 2 if with_solution else packed
+
+def pack_values(values, bits) -> bytes:
+    # values bit packed from the lowest bits up, first value in the lowest bits
+    number = 0
+    for value in reversed(values):
+        number = number << bits | value
+    return number.to_bytes((len(values) * bits + 7) // 8, "little")
+
+def unpack_values(data, cells, bits) -> list[int]:
+    number = int.from_bytes(data, "little")
+    mask = (1 << bits) - 1
+    return [number >> (n * bits) & mask for n in range(cells)]
+
+def encode_record(givens, solution = None) -> bytes:
+    # givens packed cell by cell in row order, followed by the packed solution if given
+    size = board_geometry(givens).size
+    bits = cell_bits(size)
+    record = pack_values(givens, bits)
+    if solution is not None:
+        record += pack_values(solution, bits)
+    return record
+
+def decode_record(data, box = 3) -> tuple[list[int], list[int]]:
+    # givens and solution (None if record has none) of a record from encode_record
+    size = box * box
+    cells = size * size
+    packed = record_size(box)
+    if len(data) not in [packed, packed * 2]:
+        raise ValueError(f"record of {len(data)} bytes does not fit box {box}")
+    bits = cell_bits(size)
+    givens = unpack_values(data[:packed], cells, bits)
+    solution = unpack_values(data[packed:], cells, bits) if len(data) > packed else None
+    # cell bits can hold more than size, only a corrupt record has such values
+    if max(givens) > size or (solution is not None and max(solution) > size):
+        raise ValueError(f"record has values above {size}")
+    return givens, solution
+
+class CodeCache:
+    # bounded lru of decoded codes with the highest level they passed
+    def __init__(self, size = 4096):
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries = {} # insertion ordered, oldest first
+
+    def get(self, code, level):
+        # (board, fixed) tuples if code passed at least level, None otherwise
+        with self.lock:
+            entry = self.entries.pop(code, None)
+            if entry is None:
+                return None
+            self.entries[code] = entry
+        passed, board, fixed = entry
+        return (board, fixed) if passed >= level else None
+
+    def put(self, code, level, board, fixed) -> None:
+        with self.lock:
+            old = self.entries.pop(code, None)
+            if old is not None and old[0] > level:
+                level = old[0]
+            self.entries[code] = (level, tuple(board), tuple(fixed))
+            while len(self.entries) > self.size:
+                del self.entries[next(iter(self.entries))]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+verified_codes = CodeCache()
+
+def decode_many(codes, level = "unique", engine = "bitmask"):
+    # stream (position, Sudoku or None) for an iterable of codes, e.g. the lines of an open file
+    # blank lines are skipped but still counted in position
+    for position, code in enumerate(codes):
+        code = code.strip()
+        if not code:
+            continue
+        sudoku = Sudoku(engine)
+        yield position, sudoku if sudoku.from_string(code, level) else None
+
+#solver state -----------------------------
+
+class BoardState:
+    # board together with bitmasks of digits used in every row, column and box,
+    # placements are recorded on a trail so they can be undone without copying
+    def __init__(self, board, geometry = None):
+        if geometry is None:
+            geometry = board_geometry(board)
+        self.geometry = geometry
+        self.board = board
+        self.trail = []
+        self.stats = None # SolverStats filled during search if set
+        self.rng = None # random value order during search if set
+        self.budget = None # search nodes left before giving up if set
+        self.quit_signal = None # threading.Event ending the search early once set
+        self.rows = [0] * geometry.size
+        self.cols = [0] * geometry.size
+        self.boxes = [0] * geometry.size
+        row_of = geometry.row_of
+        col_of = geometry.col_of
+        box_of = geometry.box_of
+        for i in range(geometry.cells):
+            if board[i]:
+                bit = 1 << board[i]
+                self.rows[row_of[i]] |= bit
+                self.cols[col_of[i]] |= bit
+                self.boxes[box_of[i]] |= bit
+
+    def place(self, index, value):
+        geometry = self.geometry
+        bit = 1 << value
+        self.board[index] = value
+        self.rows[geometry.row_of[index]] |= bit
+        self.cols[geometry.col_of[index]] |= bit
+        self.boxes[geometry.box_of[index]] |= bit
+        self.trail.append(index)
+
+    def remove(self, index):
+        geometry = self.geometry
+        bit = ~(1 << self.board[index])
+        self.board[index] = 0
+        self.rows[geometry.row_of[index]] &= bit
+        self.cols[geometry.col_of[index]] &= bit
+        self.boxes[geometry.box_of[index]] &= bit
+
+    def restore(self, index, value):
+        # put back a value taken out with remove, not recorded on the trail
+        geometry = self.geometry
+        bit = 1 << value
+        self.board[index] = value
+        self.rows[geometry.row_of[index]] |= bit
+        self.cols[geometry.col_of[index]] |= bit
+        self.boxes[geometry.box_of[index]] |= bit
+
+    def undo(self, mark):
+        # remove placements made after the trail had length mark
+        board = self.board
+        rows = self.rows
+        cols = self.cols
+        boxes = self.boxes
+        row_of = self.geometry.row_of
+        col_of = self.geometry.col_of
+        box_of = self.geometry.box_of
+        trail = self.trail
+        while len(trail) > mark:
+            index = trail.pop()
+            bit = ~(1 << board[index])
+            board[index] = 0
+            rows[row_of[index]] &= bit
+            cols[col_of[index]] &= bit
+            boxes[box_of[index]] &= bit
+
+    def candidates(self, index) -> int:
+        # only meaningful for empty cells
+        geometry = self.geometry
+        used = self.rows[geometry.row_of[index]] | self.cols[geometry.col_of[index]] | self.boxes[geometry.box_of[index]]
+        return geometry.all_digits & ~used
+
+    def propagate(self) -> bool:
+        # place naked and hidden singles until nothing changes, false on contradiction
+        board = self.board
+        rows = self.rows
+        cols = self.cols
+        boxes = self.boxes
+        geometry = self.geometry
+        all_digits = geometry.all_digits
+        row_of = geometry.row_of
+        col_of = geometry.col_of
+        box_of = geometry.box_of
+        start = len(self.trail)
+        evaluated = 0
+        changed = True
+        while changed:
+            changed = False
+            # cells with a single candidate
+            for i in range(geometry.cells):
+                if board[i]:
+                    continue
+                evaluated += 1
+                mask = all_digits & ~(rows[row_of[i]] | cols[col_of[i]] | boxes[box_of[i]])
+                if not mask:
+                    self.count_propagation(start, evaluated)
+                    return False
+                if not mask & (mask - 1):
+                    self.place(i, mask.bit_length() - 1)
+                    changed = True
+            # digits with a single possible cell in a row, column or box
+            for unit in geometry.units:
+                once = 0
+                more = 0
+                placed = 0
+                for i in unit:
+                    if board[i]:
+                        placed |= 1 << board[i]
+                        continue
+                    evaluated += 1
+                    mask = all_digits & ~(rows[row_of[i]] | cols[col_of[i]] | boxes[box_of[i]])
+                    more |= once & mask
+                    once |= mask
+                if once | placed != all_digits:
+                    # digit missing from unit with nowhere to go
+                    self.count_propagation(start, evaluated)
+                    return False
+                hidden = once & ~more
+                if not hidden:
+                    continue
+                for i in unit:
+                    if board[i]:
+                        continue
+                    mask = all_digits & ~(rows[row_of[i]] | cols[col_of[i]] | boxes[box_of[i]]) & hidden
+                    if not mask:
+                        continue
+                    if mask & (mask - 1):
+                        # cell would need two digits
+                        self.count_propagation(start, evaluated)
+                        return False
+                    self.place(i, mask.bit_length() - 1)
+                    changed = True
+        self.count_propagation(start, evaluated)
+        return True
+
+    def count_propagation(self, start, evaluated):
+        if self.stats is not None:
+            self.stats.propagation_steps += len(self.trail) - start
+            self.stats.candidate_evaluations += evaluated
+
+    def most_constrained(self) -> tuple[int, int]:
+        # empty cell with least candidates, (-1, 0) if board is full
+        board = self.board
+        rows = self.rows
+        cols = self.cols
+        boxes = self.boxes
+        geometry = self.geometry
+        all_digits = geometry.all_digits
+        row_of = geometry.row_of
+        col_of = geometry.col_of
+        box_of = geometry.box_of
+        index = -1
+        best_mask = 0
+        min_amt = geometry.size + 1
+        evaluated = 0
+        for i in range(geometry.cells):
+            if board[i]:
+                continue
+            evaluated += 1
+            mask = all_digits & ~(rows[row_of[i]] | cols[col_of[i]] | boxes[box_of[i]])
+            amt = mask.bit_count()
+            if amt < min_amt:
+                min_amt = amt
+                index = i
+                best_mask = mask
+                if amt <= 1:
+                    break
+        if self.stats is not None:
+            self.stats.candidate_evaluations += evaluated
+        return index, best_mask
+
+    def hidden_single(self, index, mask) -> int:
+        # candidates of index that no other empty cell in its row or column can take
+        board = self.board
+        geometry = self.geometry
+        other_r = 0
+        other_c = 0
+        for i in geometry.row_cells[geometry.row_of[index]]:
+            if not board[i] and i != index:
+                other_r |= self.candidates(i)
+        for i in geometry.col_cells[geometry.col_of[index]]:
+            if not board[i] and i != index:
+                other_c |= self.candidates(i)
+        return mask & ~(other_r & other_c)
+
+    def available_smart(self, index, mask = None) -> list[int]:
+        if self.board[index]:
+            return [self.board[index]]
+        if mask is None:
+            mask = self.candidates(index)
+        hidden = self.hidden_single(index, mask)
+        if hidden:
+            # lowest digit that has to be in this cell
+            return [(hidden & -hidden).bit_length() - 1]
+        return mask_digits(mask)
+
+class BoardIndex:
+    # per unit digit counts and masks, empty cells and conflicts of a board,
+    # updated on every assignment so board wide checks are constant time
+    def __init__(self, board):
+        geometry = board_geometry(board)
+        size = geometry.size
+        self.geometry = geometry
+        self.board = [0] * geometry.cells
+        self.row_counts = [[0] * (size + 1) for _ in range(size)]
+        self.col_counts = [[0] * (size + 1) for _ in range(size)]
+        self.box_counts = [[0] * (size + 1) for _ in range(size)]
+        self.rows = [0] * size
+        self.cols = [0] * size
+        self.boxes = [0] * size
+        self.empty = geometry.cells
+        self.conflicts = 0 # extra copies of digits within units
+        for i in range(geometry.cells):
+            if board[i]:
+                self.set(i, board[i])
+
+    def set(self, index, value):
+        old = self.board[index]
+        if old == value:
+            return
+        geometry = self.geometry
+        units = (
+            (self.row_counts[geometry.row_of[index]], self.rows, geometry.row_of[index]),
+            (self.col_counts[geometry.col_of[index]], self.cols, geometry.col_of[index]),
+            (self.box_counts[geometry.box_of[index]], self.boxes, geometry.box_of[index])
+        )
+        if old:
+            self.empty += 1
+            for counts, masks, unit in units:
+                counts[old] -= 1
+                if counts[old]:
+                    self.conflicts -= 1
+                else:
+                    masks[unit] &= ~(1 << old)
+        if value:
+            self.empty -= 1
+            for counts, masks, unit in units:
+                if counts[value]:
+                    self.conflicts += 1
+                else:
+                    masks[unit] |= 1 << value
+                counts[value] += 1
+        self.board[index] = value
+
+    def cell_conflicts(self, index) -> int:
+        geometry = self.geometry
+        value = self.board[index]
+        if self.row_counts[geometry.row_of[index]][value] > 1:
+            return 1 # is conflicting in row
+        elif self.col_counts[geometry.col_of[index]][value] > 1:
+            return 2 # is conflicting in column
+        elif self.box_counts[geometry.box_of[index]][value] > 1:
+            return 3 # is conflicting in block
+        return 0
+
+    def candidates(self, index) -> int:
+        geometry = self.geometry
+        used = self.rows[geometry.row_of[index]] | self.cols[geometry.col_of[index]] | self.boxes[geometry.box_of[index]]
+        value = self.board[index]
+        if value and not self.cell_conflicts(index):
+            # own value only used by this cell
+            used &= ~(1 << value)
+        return geometry.all_digits & ~used
+
+#dancing links -----------------------------
+
+# exact cover matrix with 4 * cells columns (cell, row-digit, column-digit and box-digit
+# constraints) and one matrix row per candidate (index * size + value - 1)
+# node 0 is the root, the next 4 * cells nodes are column headers, the rest are candidate nodes
+
+def build_dlx_template(geometry):
+    size = geometry.size
+    cells = geometry.cells
+    columns = 4 * cells
+    left = list(range(-1, columns))
+    right = list(range(1, columns + 2))
+    left[0] = columns
+    right[columns] = 0
+    up = list(range(columns + 1))
+    down = list(range(columns + 1))
+    column = list(range(columns + 1))
+    candidate = [-1] * (columns + 1)
+    counts = [0] * (columns + 1)
+    first_node = []
+    for index in range(cells):
+        for digit in range(size):
+            cols = (
+                1 + index,
+                1 + cells + geometry.row_of[index] * size + digit,
+                1 + 2 * cells + geometry.col_of[index] * size + digit,
+                1 + 3 * cells + geometry.box_of[index] * size + digit
+            )
+            start = len(column)
+            first_node.append(start)
+            for k, col in enumerate(cols):
+                node = start + k
+                left.append(start + (k - 1) % 4)
+                right.append(start + (k + 1) % 4)
+                # append at bottom of column
+                up.append(up[col])
+                down.append(col)
+                down[up[col]] = node
+                up[col] = node
+                column.append(col)
+                candidate.append(index * size + digit)
+                counts[col] += 1
+    return left, right, up, down, column, candidate, counts, first_node
+
+class DancingLinks:
+    # copy of the sudoku exact cover matrix, solved with algorithm x
+    # every cover is undone before returning, so one instance is reused per thread
+    def __init__(self, geometry):
+        if geometry.dlx_template is None:
+            geometry.dlx_template = build_dlx_template(geometry)
+        left, right, up, down, column, candidate, size, first_node = geometry.dlx_template
+        self.geometry = geometry
+        self.left = left[:]
+        self.right = right[:]
+        self.up = up[:]
+        self.down = down[:]
+        self.column = column
+        self.candidate = candidate
+        self.size = size[:]
+        self.first_node = first_node
+        self.covered = [False] * (4 * geometry.cells + 1)
+        self.trail = [] # columns covered by givens
+        self.stats = None # SolverStats filled during search if set
+        self.quit_signal = None # threading.Event ending the search early once set
+
+    def cover(self, col):
+        left = self.left
+        right = self.right
+        up = self.up
+        down = self.down
+        column = self.column
+        size = self.size
+        self.covered[col] = True
+        right[left[col]] = right[col]
+        left[right[col]] = left[col]
+        i = down[col]
+        while i != col:
+            j = right[i]
+            while j != i:
+                down[up[j]] = down[j]
+                up[down[j]] = up[j]
+                size[column[j]] -= 1
+                j = right[j]
+            i = down[i]
+
+    def uncover(self, col):
+        left = self.left
+        right = self.right
+        up = self.up
+        down = self.down
+        column = self.column
+        size = self.size
+        i = up[col]
+        while i != col:
+            j = left[i]
+            while j != i:
+                size[column[j]] += 1
+                down[up[j]] = j
+                up[down[j]] = j
+                j = left[j]
+            i = up[i]
+        right[left[col]] = col
+        left[right[col]] = col
+        self.covered[col] = False
+
+    def select(self, board) -> bool:
+        # cover the rows of all given values, false if givens conflict
+        digits = self.geometry.size
+        for index in range(self.geometry.cells):
+            if not board[index]:
+                continue
+            start = self.first_node[index * digits + board[index] - 1]
+            for node in range(start, start + 4):
+                col = self.column[node]
+                if self.covered[col]:
+                    return False
+                self.cover(col)
+                self.trail.append(col)
+        return True
+
+    def release(self):
+        # uncover givens in reverse order to restore the empty matrix
+        trail = self.trail
+        while trail:
+            self.uncover(trail.pop())
+
+    def search(self, board, limit, solutions, chosen) -> int:
+        # returns amount of solutions found, solutions only collected if list given
+        right = self.right
+        stats = self.stats
+        if stats is not None:
+            stats.nodes += 1
+            if len(chosen) > stats.max_depth:
+                stats.max_depth = len(chosen)
+        if self.quit_signal is not None and self.quit_signal.is_set():
+            return 0
+        if right[0] == 0:
+            # all constraints satisfied
+            if solutions is not None:
+                digits = self.geometry.size
+                solution = board[:]
+                for c in chosen:
+                    solution[c // digits] = c % digits + 1
+                solutions.append(solution)
+            return 1
+        # column with least remaining rows
+        size = self.size
+        col = right[0]
+        min_size = size[col]
+        c = right[col]
+        evaluated = 1
+        while c != 0 and min_size > 1:
+            evaluated += 1
+            if size[c] < min_size:
+                min_size = size[c]
+                col = c
+            c = right[c]
+        if stats is not None:
+            stats.candidate_evaluations += evaluated
+        if min_size == 0:
+            if stats is not None:
+                stats.backtracks += 1
+            return 0
+        found = 0
+        self.cover(col)
+        row = self.down[col]
+        while row != col:
+            chosen.append(self.candidate[row])
+            j = right[row]
+            while j != row:
+                self.cover(self.column[j])
+                if stats is not None:
+                    stats.propagation_steps += 1
+                j = right[j]
+            found += self.search(board, limit - found, solutions, chosen)
+            j = self.left[row]
+            while j != row:
+                self.uncover(self.column[j])
+                j = self.left[j]
+            chosen.pop()
+            if found >= limit or self.quit_signal is not None and self.quit_signal.is_set():
+                break
+            row = self.down[row]
+        self.uncover(col)
+        return found
+
+#solver statistics -----------------------
+
+class SolverStats:
+    # counters filled by the solver engines when passed as stats
+    # bitmask: propagation steps are values placed by propagation
+    # dlx: propagation steps are columns covered by chosen rows, candidate evaluations are columns compared
+    def __init__(self, cell = None):
+        self.cell = cell # cell (or list of cells for a batch) tried during a removal attempt
+        self.removed = False # if that cell could be removed
+        self.nodes = 0
+        self.backtracks = 0
+        self.max_depth = 0
+        self.propagation_steps = 0
+        self.candidate_evaluations = 0
+        self.solutions = 0
+        self.wall_time = 0.0
+
+    def add(self, other) -> None:
+        # aggregate counters of another run
+        self.nodes += other.nodes
+        self.backtracks += other.backtracks
+        self.max_depth = max(self.max_depth, other.max_depth)
+        self.propagation_steps += other.propagation_steps
+        self.candidate_evaluations += other.candidate_evaluations
+        self.solutions += other.solutions
+        self.wall_time += other.wall_time
+
+    def __repr__(self) -> str:
+        return (
+            f"SolverStats(nodes={self.nodes}, backtracks={self.backtracks}, max_depth={self.max_depth}, "
+            f"propagation_steps={self.propagation_steps}, candidate_evaluations={self.candidate_evaluations}, "
+            f"solutions={self.solutions}, wall_time={self.wall_time * 1000:.3f}ms)"
+        )
+
+def total_stats(stats) -> SolverStats:
+    # sum of a list of SolverStats, e.g. the attempts from remove_board_numbers
+    total = SolverStats()
+    for s in stats:
+        total.add(s)
+    return total
+
 #sudoku functions -------------------------
 
-def solve_board(board, limit = 2, solutions = None):
+# quit_signal -> threading.Event checked on every search node, results are incomplete once it is set
+
+def solve_board(board, limit = 2, solutions = None, engine = "bitmask", stats = None, quit_signal = None):
+    # solves board in place (restored on return) and returns copies of found solutions
     if solutions is None:
         solutions = []
-    if full_board(board):
-        solutions.append(board)
-        return solutions
+    run_solver(board, limit - len(solutions), solutions, engine, stats, quit_signal)
+    return solutions
+
+def count_solutions(board, cap = 2, engine = "bitmask", stats = None, quit_signal = None) -> int:
+    # amount of solutions, stops counting at cap without building solution boards
+    return run_solver(board, cap, None, engine, stats, quit_signal)
+
+def has_unique_solution(board, witness = False, engine = "bitmask", stats = None, quit_signal = None):
+    # witness -> also return a second solution (or None) proving non-uniqueness
+    if not witness:
+        return count_solutions(board, 2, engine, stats, quit_signal) == 1
+    solutions = solve_board(board, 2, engine= engine, stats= stats, quit_signal= quit_signal)
+    return len(solutions) == 1, solutions[1] if len(solutions) > 1 else None
+
+def run_solver(board, limit, solutions, engine, stats, quit_signal = None) -> int:
+    if stats is None:
+        return SOLVERS[engine](board, limit, solutions, None, quit_signal)
+    start = time.perf_counter()
+    found = SOLVERS[engine](board, limit, solutions, stats, quit_signal)
+    stats.wall_time += time.perf_counter() - start
+    stats.solutions += found
+    return found
+
+def solve_bitmask(board, limit, solutions, stats = None, quit_signal = None) -> int:
+    state = BoardState(board)
+    state.stats = stats
+    state.quit_signal = quit_signal
+    return search_board(state, limit, solutions)
+
+dlx_local = threading.local()
+
+def solve_dlx(board, limit, solutions, stats = None, quit_signal = None) -> int:
+    geometry = board_geometry(board)
+    if not hasattr(dlx_local, "links"):
+        dlx_local.links = {}
+    links = dlx_local.links.get(geometry.box)
+    if links is None:
+        links = dlx_local.links[geometry.box] = DancingLinks(geometry)
+    links.stats = stats
+    links.quit_signal = quit_signal
+    try:
+        if not links.select(board):
+            return 0
+        return links.search(board, limit, solutions, [])
+    finally:
+        links.release()
+        links.stats = None
+        links.quit_signal = None
+
+SOLVERS = {
+    "bitmask": solve_bitmask,
+    "dlx": solve_dlx
+}
+
+def search_board(state, limit, solutions, depth = 0) -> int:
+    # returns amount of solutions found, solutions only collected if list given
+    found = 0
+    stats = state.stats
+    if stats is not None:
+        stats.nodes += 1
+        if depth > stats.max_depth:
+            stats.max_depth = depth
+    if state.budget is not None:
+        state.budget -= 1
+        if state.budget < 0:
+            return found
+    if state.quit_signal is not None and state.quit_signal.is_set():
+        return found
+    # fill in forced values before branching
+    start = len(state.trail)
+    if not state.propagate():
+        state.undo(start)
+        if stats is not None:
+            stats.backtracks += 1
+        return found
     # get empty cell with least amount of options
-    index = -1
-    min_amt = 10
-    for i in range(81):
-        if board[i] != 0:
+    index, mask = state.most_constrained()
+    if index < 0:
+        if solutions is not None:
+            solutions.append(state.board[:])
+        found = 1
+    elif mask:
+        # try all possible numbers
+        mark = len(state.trail)
+        values = mask_digits(mask)
+        if state.rng is not None:
+            values = values[:]
+            state.rng.shuffle(values)
+        for val in values:
+            state.place(index, val)
+            found += search_board(state, limit - found, solutions, depth + 1)
+            state.undo(mark)
+            if found >= limit or state.budget is not None and state.budget < 0:
+                break
+            if state.quit_signal is not None and state.quit_signal.is_set():
+                break
+    elif stats is not None:
+        stats.backtracks += 1
+    state.undo(start)
+    return found
+
+def removable_clues(board, limit = None, quit_signal = None) -> list[int]:
+    # clues that can be emptied keeping the solution unique, board must have exactly one solution
+    # one BoardState is shared by all clues: a clue is lifted, every other value it could take is
+    # searched for a single solution (any means the clue is needed), then the clue is put back
+    state = BoardState(board[:])
+    state.quit_signal = quit_signal
+    removable = []
+    for i in range(state.geometry.cells):
+        value = state.board[i]
+        if not value:
             continue
-        amt_options = len(get_available(board, i))
-        if amt_options == 0:
-            return solutions
-        if amt_options < min_amt:
-            min_amt = amt_options
-            index = i
-            if amt_options == 1:
+        state.remove(i)
+        needed = False
+        mark = len(state.trail)
+        for other in mask_digits(state.candidates(i) & ~(1 << value)):
+            state.place(i, other)
+            needed = search_board(state, 1, None) > 0
+            state.undo(mark)
+            if needed:
                 break
-    # index = board.index(0)
-    # try all possible numbers
-    for val in get_available_smart(board, index):
-        board[index] = val
-        solutions = solve_board(board[:], limit, solutions)
-        if len(solutions) >= limit:
+        state.restore(i, value)
+        if quit_signal is not None and quit_signal.is_set():
             break
-    return solutions
+        if not needed:
+            removable.append(i)
+            if limit is not None and len(removable) >= limit:
+                break
+    return removable
+
+def is_minimal(board) -> bool:
+    # unique solution and no clue can be removed without losing it
+    return has_unique_solution(board) and not removable_clues(board, 1)
 
-def thread_work(board, remaining, options, mutex):
+def thread_work(board, remaining, options, mutex, engine = "bitmask", stats = None, quit_signal = None):
     # get index
     mutex.acquire()
     index = remaining.pop()
     mutex.release()
     # remove cell value
     board[index] = 0
+    attempt = None if stats is None else SolverStats(index)
     # one solution -> to be added to list of possible removals for main thread
-    if len(solve_board(board)) <= 1:
-        mutex.acquire()
+    removable = count_solutions(board, 2, engine, attempt, quit_signal) <= 1
+    mutex.acquire()
+    if removable:
         remaining.append(index)
         options.append(index)
-        mutex.release()
+    if attempt is not None:
+        attempt.removed = removable
+        stats.append(attempt)
+    mutex.release()
+
+class SharedSignal:
+    # event like flag shared with worker processes, is_set is a plain memory read
+    # so the solvers can check it on every search node like a threading.Event
+    def __init__(self):
+        self.flag = multiprocessing.RawValue("b", 0)
+
+    def is_set(self) -> bool:
+        return self.flag.value != 0
+
+    def set(self) -> None:
+        self.flag.value = 1
+
+    def clear(self) -> None:
+        self.flag.value = 0
+
+removal_signal = None # SharedSignal of the CheckPool a worker process belongs to
+
+def removal_init(signal):
+    global removal_signal
+    removal_signal = signal
+
+def removal_work(job):
+    # check on a worker process if cell can be emptied keeping a unique solution
+    # once the pool's signal is set the result is meaningless and only returned to finish the task
+    board, cell, engine, with_stats = job
+    board[cell] = 0
+    attempt = SolverStats(cell) if with_stats else None
+    removable = count_solutions(board, 2, engine, attempt, removal_signal) <= 1
+    if attempt is not None:
+        attempt.removed = removable
+    return cell, removable, attempt
+
+class CheckPool:
+    # persistent worker processes for the removal checks of remove_board_numbers
+    def __init__(self, workers = None):
+        self.workers = workers if workers else os.cpu_count()
+        self.signal = SharedSignal() # set to make the workers drop the checks of a quit check call
+        self.lock = threading.Lock() # one check at a time, so a check never queues behind dropped work
+        self.pool = multiprocessing.Pool(self.workers, removal_init, (self.signal,))
+
+    def check(self, board, cells, engine = "bitmask", quit_signal = None, with_stats = False):
+        # list of (cell, removable, stats) in order of cells, None if quit_signal got set first
+        with self.lock:
+            result = self.pool.map_async(removal_work, [(board, cell, engine, with_stats) for cell in cells])
+            while not result.ready():
+                if quit_signal is not None and quit_signal.is_set():
+                    # workers stop their searches, wait for them so the next check starts on idle workers
+                    self.signal.set()
+                    result.wait()
+                    self.signal.clear()
+                    return None
+                result.wait(0.005)
+            return result.get()
+
+    def close(self) -> None:
+        self.pool.terminate()
+        self.pool.join()
+
+shared_pool = None
+
+def check_pool() -> CheckPool:
+    # pool sized by os.cpu_count(), started on first use and kept for later puzzles
+    global shared_pool
+    if shared_pool is None:
+        shared_pool = CheckPool()
+    return shared_pool
+
+def peer_mask(board, index):
+    # digits used by the cells sharing row, column or box with index
+    used = 0
+    for i in board_geometry(board).peers[index]:
+        used |= 1 << board[i]
+    return used
 
 # old available function
 def get_available(board, index):
-    available = []
-    for i in range(9):
-        val = i + 1
-        if not conflicts(board, index, val):
-            available.append(val)
-    return available
+    return mask_digits(board_geometry(board).all_digits & ~peer_mask(board, index))[:]
 # newer smarted available function
 def get_available_smart(board, index):
-    available = []
     if board[index]:
         return [board[index]]
-    row = index // 9
-    col = index % 9
-    for i in range(9):
-        val = i + 1
-        conflict = conflicts(board, index, val)
-        if conflict:
-            continue
-        else:
-            other_r = False
-            other_c = False
-            for r in range(9):
-                index_r = row * 9 + r
-                index_c = r * 9 + col
-                if (not board[index_r] and
-                    index_r != index and
-                    not other_r and
-                    not conflicts(board, index_r, val)):
-                    other_r = True
-                if (not board[index_c] and
-                    index_c != index and
-                    not other_c and
-                    not conflicts(board, index_c, val)):
-                    other_c = True
-            if not other_r or not other_c:
-                return [val]
-            available.append(val)
-    return available
+    return BoardState(board).available_smart(index)[:]
 # new available function for fine printing
 def get_available_analysis(board, index):
     available = []
     messages = []
     if board[index]:
         return [board[index]], [f"'{board[index]}' is this cell's assigned value"]
-    row = index // 9
-    col = index % 9
-    for i in range(9):
+    size = board_geometry(board).size
+    row = index // size
+    col = index % size
+    for i in range(size):
         val = i + 1
         conflict = conflicts(board, index, val)
         if conflict == 1:
@@ -354,9 +1463,9 @@ def get_available_analysis(board, index):
         else:
             other_r = False
             other_c = False
-            for r in range(9):
-                index_r = row * 9 + r
-                index_c = r * 9 + col
+            for r in range(size):
+                index_r = row * size + r
+                index_c = r * size + col
                 if (not board[index_r] and
                     index_r != index and
                     not other_r and
@@ -376,7 +1485,7 @@ def get_available_analysis(board, index):
     return available, messages
 
 def valid_board(board):
-    for i in range(81):
+    for i in range(len(board)):
         value = board[i]
         if value == 0:
             continue
@@ -385,12 +1494,15 @@ def valid_board(board):
     return True
 
 def conflicts(board, index, value):
-    row = index // 9
-    col = index % 9
-    for j in range(9):
-        idx_row = row * 9 + j
-        idx_col = col + 9 * j
-        idx_block = ((row // 3) * 3 + j // 3) * 9 + (col // 3) * 3 + j % 3
+    geometry = board_geometry(board)
+    size = geometry.size
+    box = geometry.box
+    row = index // size
+    col = index % size
+    for j in range(size):
+        idx_row = row * size + j
+        idx_col = col + size * j
+        idx_block = ((row // box) * box + j // box) * size + (col // box) * box + j % box
         if idx_row != index and board[idx_row] == value:
             return 1 # is conflicting in row
         elif idx_col != index and board[idx_col] == value:
@@ -403,17 +1515,627 @@ def full_board(board):
     return all(map(lambda c: c != 0, board))
 
 def print_board(board):
+    geometry = board_geometry(board)
+    size = geometry.size
+    box = geometry.box
+    width = len(str(size))
     section = ""
-    for i in range(81):
+    for i in range(geometry.cells):
         value = board[i]
         value = value if value != 0 else "."
-        section += f"{value} "
-        if (i + 1) % 3 == 0 and (i + 1) % 9 != 0:
+        section += f"{value:>{width}} "
+        if (i + 1) % box == 0 and (i + 1) % size != 0:
             section += "|"
-        if i % (3 * 9) == 0 and i > 0:
-            print("--------" + "+---------" * 2)
-        if (i + 1) % 9 == 0:
+        if i % (box * size) == 0 and i > 0:
+            print("-" * (box * (width + 2) - 1) + ("+" + "-" * (box * (width + 2))) * (box - 1))
+        if (i + 1) % size == 0:
             print(section)
             section = ""
         else:
             section += " "
+
+#canonical form ---------------------------
+
+# the minlex form is the transform with the smallest cells read row by row, empty cells as 0 and
+# values relabelled in order of first appearance. it is built one row at a time keeping only the
+# partial transforms that reach the smallest row so far, columns are not fixed up front but kept as
+# ordered groups that later rows split, so most of the symmetry group is never visited
+
+def canonical_form(board) -> tuple[list[int], list[int], list[int], bool]:
+    # (relabel, rows, cols, transpose) for Sudoku.transform giving the minlex form of board
+    geometry = board_geometry(board)
+    box = geometry.box
+    size = geometry.size
+    grids = [board, [board[c * size + r] for r in range(size) for c in range(size)]]
+    # blocks of stacks that can still swap, stacks as (stack, ordered groups of columns that can still swap)
+    blocks = [[(s, [[s * box + i for i in range(box)]]) for s in range(box)]]
+    nodes = [(transpose, [], blocks, {}) for transpose in [False, True]]
+    for _ in range(size):
+        best = None
+        candidates = []
+        for node in nodes:
+            transpose, rows, blocks, labels = node
+            grid = grids[transpose]
+            for row in next_rows(rows, box):
+                values = grid[row * size:(row + 1) * size]
+                key = row_key(values, blocks, labels, size + 1)
+                if best is None or key < best:
+                    best = key
+                    candidates = []
+                if key == best:
+                    candidates.append((node, row, values))
+        nodes = []
+        for node, row, values in candidates:
+            nodes.extend(expand_node(node, row, values, size + 1))
+    transpose, rows, blocks, labels = nodes[0]
+    cols = [c for block in blocks for _, groups in block for group in groups for c in group]
+    # values missing from the puzzle take the labels left over
+    spare = iter(v for v in range(1, size + 1) if v not in labels.values())
+    relabel = [labels[v] if v in labels else next(spare) for v in range(1, size + 1)]
+    return relabel, rows, cols, transpose
+
+def next_rows(rows, box):
+    # rows that can come next, any row of an unused band when a band is complete
+    if len(rows) % box == 0:
+        bands = {row // box for row in rows}
+        return [r for r in range(box * box) if r // box not in bands]
+    band = rows[-1] // box
+    return [r for r in range(band * box, band * box + box) if r not in rows]
+
+def cell_key(value, labels, new) -> int:
+    # empty cells first, then labelled values, values without a label all sort as new
+    if not value:
+        return 0
+    return labels.get(value, new)
+
+def stack_key(values, groups, labels, new) -> list[int]:
+    key = []
+    for group in groups:
+        key += sorted(cell_key(values[c], labels, new) for c in group)
+    return key
+
+def row_key(values, blocks, labels, new) -> list[int]:
+    # smallest row reachable with the columns still free, new values stand for the next labels
+    key = []
+    for block in blocks:
+        for stack_row in sorted(stack_key(values, groups, labels, new) for _, groups in block):
+            key += stack_row
+    return key
+
+def split_groups(values, groups, labels, new) -> list[list[list[int]]]:
+    # ways to order the columns of a stack for this row: empty cells stay swappable,
+    # labelled values sort by label, unlabelled values get their labels from the order so each order is tried
+    options = [[]]
+    for group in groups:
+        empty = [c for c in group if not values[c]]
+        labelled = sorted((c for c in group if values[c] in labels), key=lambda c: labels[values[c]])
+        unlabelled = [c for c in group if values[c] and values[c] not in labels]
+        head = ([empty] if empty else []) + [[c] for c in labelled]
+        tails = [[[c] for c in order] for order in itertools.permutations(unlabelled)]
+        options = [option + head + tail for option in options for tail in tails]
+    return options
+
+def expand_node(node, row, values, new) -> list[tuple]:
+    # child nodes with row placed next, one per way of ordering the ties left by its values
+    transpose, rows, blocks, labels = node
+    block_options = [[]]
+    for block in blocks:
+        keyed = sorted(((stack_key(values, groups, labels, new), stack, groups) for stack, groups in block), key=lambda k: k[0])
+        # stacks with equal keys stay swappable unless new labels depend on their order
+        ties = []
+        for key, stack, groups in keyed:
+            if ties and ties[-1][0] == key:
+                ties[-1][1].append((stack, groups))
+            else:
+                ties.append((key, [(stack, groups)]))
+        options = [[]]
+        for key, stacks in ties:
+            if len(stacks) > 1 and new not in key:
+                orders = [[stacks]]
+            else:
+                orders = [[[stack] for stack in order] for order in itertools.permutations(stacks)]
+            refined = []
+            for order in orders:
+                order_options = [[]]
+                for sub_block in order:
+                    sub_options = [[]]
+                    for stack, groups in sub_block:
+                        sub_options = [
+                            sub + [(stack, split)] for sub in sub_options for split in split_groups(values, groups, labels, new)
+                        ]
+                    order_options = [option + [sub] for option in order_options for sub in sub_options]
+                refined += order_options
+            options = [option + choice for option in options for choice in refined]
+        block_options = [option + choice for option in block_options for choice in options]
+    children = []
+    for new_blocks in block_options:
+        new_labels = dict(labels)
+        for block in new_blocks:
+            for _, groups in block:
+                for group in groups:
+                    for c in group:
+                        if values[c] and values[c] not in new_labels:
+                            new_labels[values[c]] = len(new_labels) + 1
+        children.append((transpose, rows + [row], new_blocks, new_labels))
+    return children
+
+#generation jobs --------------------------
+
+class GenerationJob:
+    # generates a puzzle on a background thread, progress is reported as events
+    # ("board", None) once the solved board exists, ("remaining", n) every removal round,
+    # ("done", result) at the end where result is (board, fixed) or None if cancelled
+    def __init__(self, sudoku, end = 0, multithread = True, pool = None, batch = False, on_progress = None):
+        self.sudoku = sudoku
+        self.end = end
+        self.multithread = multithread
+        self.pool = pool
+        self.batch = batch
+        self.on_progress = on_progress # called as on_progress(event, value) from the job thread
+        self.events = queue.Queue()
+        self.quit_signal = threading.Event()
+        self.finished = threading.Event()
+        self.remaining = sudoku.geometry.cells - end
+        self.result = None
+        self.error = None
+        self.thread = None
+
+    def start(self) -> "GenerationJob":
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, daemon=True)
+            self.thread.start()
+        return self
+
+    def run(self) -> None:
+        try:
+            board, _ = self.sudoku.generate_completed_board(self.quit_signal)
+            if board is not None:
+                self.report("board", None)
+                board, fixed = self.sudoku.remove_board_numbers(
+                    self.end,
+                    self.multithread,
+                    self.quit_signal,
+                    pool= self.pool,
+                    batch= self.batch,
+                    progress= lambda remaining: self.report("remaining", remaining)
+                )
+                if board is not None:
+                    self.remaining = 0
+                    self.result = board, fixed
+        except Exception as e:
+            self.error = e
+        self.finished.set()
+        self.report("done", self.result)
+
+    def report(self, event, value) -> None:
+        if event == "remaining":
+            self.remaining = value
+        self.events.put((event, value))
+        if self.on_progress is not None:
+            self.on_progress(event, value)
+
+    def poll(self) -> list[tuple]:
+        # events reported since the last poll, never blocks
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def cancel(self) -> None:
+        # solver searches check the signal on every node, so the thread ends within milliseconds
+        self.quit_signal.set()
+
+    def done(self) -> bool:
+        return self.finished.is_set()
+
+    def cancelled(self) -> bool:
+        return self.quit_signal.is_set()
+
+    def wait(self, timeout = None):
+        # (board, fixed) when finished, None if cancelled or still running after timeout
+        self.finished.wait(timeout)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+    def join(self, timeout = None) -> None:
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+#grading ----------------------------------
+
+# techniques from easiest to hardest with their score per use
+GRADE_LEVELS = ["naked single", "hidden single", "naked pair", "pointing", "x-wing", "guess"]
+GRADE_WEIGHTS = [1, 2, 10, 15, 30, 100]
+
+class Grade:
+    def __init__(self):
+        self.solved = False # solved without guessing (within max_level)
+        self.level = 0 # index of hardest technique needed, see GRADE_LEVELS
+        self.score = 0
+        self.counts = [0] * len(GRADE_LEVELS) # uses per technique
+
+    @property
+    def technique(self) -> str:
+        return GRADE_LEVELS[self.level]
+
+    def __repr__(self) -> str:
+        return f"Grade(solved={self.solved}, technique={self.technique!r}, score={self.score})"
+
+class LogicalSolver:
+    # candidate masks per cell, reduced with human solving techniques
+    def __init__(self, board):
+        geometry = board_geometry(board)
+        self.geometry = geometry
+        self.board = board[:]
+        self.candidates = [0] * geometry.cells
+        self.broken = False # an empty cell ran out of candidates
+        for i in range(geometry.cells):
+            if not board[i]:
+                used = 0
+                for p in geometry.peers[i]:
+                    used |= 1 << board[p]
+                self.candidates[i] = geometry.all_digits & ~used
+                if not self.candidates[i]:
+                    self.broken = True
+
+    def place(self, index, value):
+        self.board[index] = value
+        self.candidates[index] = 0
+        self.eliminate(self.geometry.peers[index], 1 << value)
+
+    def eliminate(self, cells, mask) -> bool:
+        # remove mask from the candidates of cells, true if anything changed
+        changed = False
+        candidates = self.candidates
+        for i in cells:
+            if candidates[i] & mask:
+                candidates[i] &= ~mask
+                changed = True
+                if not candidates[i]:
+                    self.broken = True
+        return changed
+
+    def naked_single(self) -> bool:
+        for i, mask in enumerate(self.candidates):
+            if mask and not mask & (mask - 1):
+                self.place(i, mask.bit_length() - 1)
+                return True
+        return False
+
+    def hidden_single(self) -> bool:
+        candidates = self.candidates
+        for unit in self.geometry.units:
+            once = 0
+            more = 0
+            for i in unit:
+                more |= once & candidates[i]
+                once |= candidates[i]
+            hidden = once & ~more
+            if hidden:
+                digit = (hidden & -hidden).bit_length() - 1
+                for i in unit:
+                    if candidates[i] >> digit & 1:
+                        self.place(i, digit)
+                        return True
+        return False
+
+    def naked_pair(self) -> bool:
+        candidates = self.candidates
+        for unit in self.geometry.units:
+            pairs = {}
+            for i in unit:
+                if candidates[i].bit_count() == 2:
+                    pairs.setdefault(candidates[i], []).append(i)
+            for mask, cells in pairs.items():
+                if len(cells) == 2 and self.eliminate([i for i in unit if i not in cells], mask):
+                    return True
+        return False
+
+    def pointing(self) -> bool:
+        # digit confined to one line inside a box (or one box inside a line) is removed from the rest
+        geometry = self.geometry
+        candidates = self.candidates
+        for box_cells in geometry.box_cells:
+            for line_of, line_cells in [(geometry.row_of, geometry.row_cells), (geometry.col_of, geometry.col_cells)]:
+                for digit in range(1, geometry.size + 1):
+                    bit = 1 << digit
+                    lines = {line_of[i] for i in box_cells if candidates[i] & bit}
+                    if len(lines) != 1:
+                        continue
+                    line = lines.pop()
+                    if self.eliminate([i for i in line_cells[line] if i not in box_cells], bit):
+                        return True
+        for line_cells in geometry.row_cells + geometry.col_cells:
+            for digit in range(1, geometry.size + 1):
+                bit = 1 << digit
+                boxes = {geometry.box_of[i] for i in line_cells if candidates[i] & bit}
+                if len(boxes) != 1:
+                    continue
+                box = boxes.pop()
+                if self.eliminate([i for i in geometry.box_cells[box] if i not in line_cells], bit):
+                    return True
+        return False
+
+    def x_wing(self) -> bool:
+        geometry = self.geometry
+        size = geometry.size
+        candidates = self.candidates
+        for lines, crosses in [(geometry.row_cells, geometry.col_cells), (geometry.col_cells, geometry.row_cells)]:
+            for digit in range(1, size + 1):
+                bit = 1 << digit
+                # lines where digit fits in exactly two positions
+                found = {}
+                for n, line in enumerate(lines):
+                    positions = tuple(k for k, i in enumerate(line) if candidates[i] & bit)
+                    if len(positions) == 2:
+                        found.setdefault(positions, []).append(n)
+                for positions, wing in found.items():
+                    if len(wing) != 2:
+                        continue
+                    others = [
+                        crosses[k][n] for k in positions for n in range(size) if n not in wing
+                    ]
+                    if self.eliminate(others, bit):
+                        return True
+        return False
+
+    def contradiction(self) -> bool:
+        return self.broken
+
+def grade_board(board, max_level = None) -> Grade:
+    # solve with the easiest technique that makes progress each step,
+    # stops early if max_level is given and a harder technique would be needed
+    solver = LogicalSolver(board)
+    techniques = [solver.naked_single, solver.hidden_single, solver.naked_pair, solver.pointing, solver.x_wing]
+    grade = Grade()
+    while 0 in solver.board:
+        if solver.contradiction():
+            grade.level = len(GRADE_LEVELS) - 1
+            return grade
+        for level, technique in enumerate(techniques):
+            if max_level is not None and level > max_level:
+                grade.level = level
+                return grade
+            if technique():
+                grade.counts[level] += 1
+                grade.score += GRADE_WEIGHTS[level]
+                grade.level = max(grade.level, level)
+                break
+        else:
+            # needs guessing
+            grade.level = len(GRADE_LEVELS) - 1
+            grade.score += GRADE_WEIGHTS[-1]
+            return grade
+    grade.solved = True
+    return grade
+
+#vectorized analysis ----------------------
+
+def numpy_tables(geometry):
+    # numpy versions of the geometry lookups, built once per geometry
+    if geometry.np_tables is None:
+        peers = numpy.zeros((geometry.cells, geometry.cells), dtype=bool)
+        for i in range(geometry.cells):
+            peers[i, list(geometry.peers[i])] = True
+        digits = numpy.arange(1, geometry.size + 1)
+        geometry.np_tables = {
+            "row_of": numpy.array(geometry.row_of),
+            "col_of": numpy.array(geometry.col_of),
+            "box_of": numpy.array(geometry.box_of),
+            "digits": digits,
+            "digit_bits": numpy.left_shift(1, digits, dtype=numpy.int64),
+            "peers": peers
+        }
+    return geometry.np_tables
+
+def unit_sums(matrix, geometry):
+    # per digit totals of a (cells, size) matrix for every row, column and box, each (size, size)
+    size = geometry.size
+    box = geometry.box
+    cells = matrix.reshape(size, size, size)
+    boxes = matrix.reshape(box, box, box, box, size).sum(axis=(1, 3)).reshape(size, size)
+    return cells.sum(axis=1), cells.sum(axis=0), boxes
+
+def candidate_matrix(board):
+    # (cells, size) bool array, True where digit column + 1 is possible in an empty cell
+    geometry = board_geometry(board)
+    tables = numpy_tables(geometry)
+    values = numpy.asarray(board)
+    rows, cols, boxes = unit_sums(values[:, None] == tables["digits"], geometry)
+    blocked = (rows[tables["row_of"]] + cols[tables["col_of"]] + boxes[tables["box_of"]]) > 0
+    return (values == 0)[:, None] & ~blocked
+
+def hidden_single_matrix(candidates, include_boxes = False):
+    # candidates that are the only place for their digit in the row or column (or box)
+    geometry = board_geometry(candidates)
+    tables = numpy_tables(geometry)
+    rows, cols, boxes = unit_sums(candidates, geometry)
+    once = (rows == 1)[tables["row_of"]] | (cols == 1)[tables["col_of"]]
+    if include_boxes:
+        once |= (boxes == 1)[tables["box_of"]]
+    return candidates & once
+
+def pair_matrix(candidates):
+    # cells with two candidates sharing a unit with a cell that has the same two
+    tables = numpy_tables(board_geometry(candidates))
+    two = candidates.sum(axis=1) == 2
+    keys = numpy.where(two, candidates @ tables["digit_bits"], -1)
+    same = (keys[:, None] == keys[None, :]) & tables["peers"]
+    return two & same.any(axis=1)
+
+#batch solving ----------------------------
+
+def solve_work(job):
+    # solve one board or puzzle code, None if invalid or without unique solution
+    position, puzzle, engine = job
+    if isinstance(puzzle, str):
+        sudoku = Sudoku(engine)
+        # uniqueness is checked by the solve below, from_string would solve the code a second time
+        if not sudoku.from_string(puzzle, "consistency"):
+            return position, None
+        board = sudoku.board
+    else:
+        board = list(puzzle)
+        try:
+            # raises for boards that are not a sudoku size, valid_board skips it on empty boards
+            board_geometry(board)
+            if not valid_board(board):
+                return position, None
+        except ValueError:
+            # not a sudoku sized board
+            return position, None
+    solutions = solve_board(board, 2, engine= engine)
+    if len(solutions) != 1:
+        return position, None
+    return position, solutions[0]
+
+def solve_many(puzzles, workers = None, ordered = False, engine = "bitmask", chunksize = 8):
+    # stream (position, solution) for an iterable of boards or codes as they finish
+    jobs = ((position, puzzle, engine) for position, puzzle in enumerate(puzzles))
+    if workers == 1:
+        for job in jobs:
+            yield solve_work(job)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        results = pool.imap(solve_work, jobs, chunksize) if ordered else pool.imap_unordered(solve_work, jobs, chunksize)
+        for result in results:
+            yield result
+
+#command line -----------------------------
+
+def generate_work(job):
+    # generate one puzzle code on a worker process
+    seed, box, end, clues, engine, minimal = job
+    sudoku = Sudoku(engine, box, seed)
+    sudoku.generate_completed_board()
+    if minimal:
+        sudoku.make_minimal(False)
+    else:
+        sudoku.remove_board_numbers(end, False, clues= clues)
+    return sudoku.to_string()
+
+def generate_codes(count, box = 3, end = 0, clues = None, seed = None, workers = 1, engine = "bitmask", minimal = False):
+    # stream puzzle codes in order, puzzle n uses seed + n so output does not depend on workers
+    jobs = ((None if seed is None else seed + n, box, end, clues, engine, minimal) for n in range(count))
+    if workers == 1:
+        for job in jobs:
+            yield generate_work(job)
+        return
+    with multiprocessing.Pool(workers) as pool:
+        for code in pool.imap(generate_work, jobs):
+            yield code
+
+def read_codes(sources):
+    # codes from arguments, or lines of stdin when none are given ("-" reads stdin too)
+    for source in sources or ["-"]:
+        if source == "-":
+            for line in sys.stdin:
+                if line.strip():
+                    yield line.strip()
+        else:
+            yield source
+
+def board_symbols(board) -> str:
+    size = board_geometry(board).size
+    return "".join(value_symbol(value, size) if value else "." for value in board)
+
+def command_generate(args, output) -> int:
+    for code in generate_codes(args.count, args.box, args.end, args.clues, args.seed, args.workers, args.engine, args.minimal):
+        output.write(code + "\n")
+        output.flush()
+    return 0
+
+def command_solve(args, output) -> int:
+    failed = 0
+    for _, solution in solve_many(read_codes(args.codes), args.workers, True, args.engine):
+        if solution is None:
+            failed += 1
+            output.write("invalid\n")
+        else:
+            output.write(board_symbols(solution) + "\n")
+        output.flush()
+    return 1 if failed else 0
+
+def command_validate(args, output) -> int:
+    failed = 0
+    for code in read_codes(args.codes):
+        sudoku = Sudoku(args.engine)
+        valid = sudoku.from_string(code, args.level) and (not args.minimal or not removable_clues(sudoku.board, 1))
+        if not valid:
+            failed += 1
+        output.write(f"{code} {'valid' if valid else 'invalid'}\n")
+        output.flush()
+    return 1 if failed else 0
+
+def command_bench(args, output) -> int:
+    # generation throughput plus uniqueness checks and solves on the generated puzzles
+    start = time.perf_counter()
+    codes = list(generate_codes(args.count, args.box, args.end, args.clues, args.seed, args.workers, args.engine))
+    generate_time = time.perf_counter() - start
+    boards = []
+    for code in codes:
+        sudoku = Sudoku(args.engine)
+        sudoku.from_string(code, "syntax")
+        boards.append(sudoku.board)
+    stats = SolverStats()
+    for board in boards:
+        count_solutions(board, 2, args.engine, stats)
+    clues = sum(len(board) - board.count(0) for board in boards) / len(boards)
+    output.write(f"generated {len(codes)} puzzles in {generate_time:.3f}s ({len(codes) / max(generate_time, 1e-9):.1f}/s, {args.workers} workers)\n")
+    output.write(f"average clues {clues:.1f}\n")
+    output.write(f"uniqueness check {stats.wall_time / len(boards) * 1000:.3f}ms average ({args.engine})\n")
+    output.write(f"{stats}\n")
+    return 0
+
+def positive_int(text) -> int:
+    # argparse type for counts that have to be at least 1
+    value = int(text)
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"has to be at least 1, got {value}")
+    return value
+
+def main(argv = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m sudoku", description="Generate, solve and validate sudoku codes without the game window.")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--engine", choices=list(SOLVERS), default="bitmask", help="solver used for uniqueness checks")
+    common.add_argument("--output", "-o", help="write to file instead of stdout")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_parser = commands.add_parser("generate", parents=[common], help="stream new puzzle codes")
+    bench_parser = commands.add_parser("bench", parents=[common], help="time generation and uniqueness checks")
+    for command in [generate_parser, bench_parser]:
+        # bench averages over the puzzles, so it needs at least one
+        command.add_argument("--count", "-n", type=int if command is generate_parser else positive_int, default=1 if command is generate_parser else 20)
+        command.add_argument("--clues", type=int, help="stop removing once at most this many clues are left")
+        command.add_argument("--end", type=int, default=0, help="cells left unchecked when removing, like the game difficulties")
+        command.add_argument("--seed", type=int, help="seed of the first puzzle, puzzle n uses seed + n")
+        command.add_argument("--workers", type=positive_int, default=1, help="worker processes")
+        command.add_argument("--box", type=int, choices=CODE_BOXES, default=3, help="box size, 3 for 9x9")
+
+    for name, text in [("solve", "print solutions of puzzle codes"), ("validate", "check puzzle codes have a unique solution")]:
+        command = commands.add_parser(name, parents=[common], help=text)
+        command.add_argument("codes", nargs="*", help="puzzle codes, read from stdin if none given")
+        if name == "solve":
+            command.add_argument("--workers", type=positive_int, default=1, help="worker processes")
+        else:
+            command.add_argument("--minimal", action="store_true", help="also require that no clue can be removed")
+            command.add_argument("--level", choices=CODE_LEVELS, default="unique", help="checks a code has to pass")
+    generate_parser.add_argument("--minimal", action="store_true", help="remove clues until none can be removed")
+
+    args = parser.parse_args(argv)
+    command = {
+        "generate": command_generate,
+        "solve": command_solve,
+        "validate": command_validate,
+        "bench": command_bench
+    }[args.command]
+    if args.output is None:
+        return command(args, sys.stdout)
+    with open(args.output, "w") as output:
+        return command(args, output)
+
+if __name__ == "__main__":
+    sys.exit(main())